@@ -0,0 +1,72 @@
+import numpy as np
+
+
+class Adjacency:
+    '''
+    Compressed sparse row (CSR) index of the neighbors of the tiles of a board.
+    The alive neighbors of tile i are neighbors[offsets[i]:offsets[i+1]], dead tiles have no neighbors.
+    degree keeps the number of neighbors of the full topology (dead ones included), which is what
+    the behaviors divide by. Tiles are numbered as in Board.tiles, i.e. x + y*X.
+    '''
+    def __init__(self, shape:tuple, offsets:np.ndarray, neighbors:np.ndarray, degree:np.ndarray, alive:np.ndarray):
+        self.shape = shape
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.degree = degree
+        self.alive = alive
+
+        self.count = np.diff(self.offsets)
+        self.owners = np.repeat(np.arange(len(self.count)), self.count)
+        self._starts = self.offsets[:-1][self.count > 0]
+
+    @staticmethod
+    def from_edges(shape:tuple, owners:np.ndarray, neighbors:np.ndarray, alive:np.ndarray) -> 'Adjacency':
+        n = int(np.prod(shape))
+        degree = np.bincount(owners, minlength=n)
+        keep = alive[owners] & alive[neighbors]
+        owners, neighbors = owners[keep], neighbors[keep]
+        order = np.lexsort((neighbors, owners))
+        offsets = np.zeros(n + 1, dtype=int)
+        offsets[1:] = np.cumsum(np.bincount(owners, minlength=n))
+        return Adjacency(shape, offsets, neighbors[order], degree, alive)
+
+    @staticmethod
+    def grid(X:int, Y:int, alive:np.ndarray = None) -> 'Adjacency':
+        '''
+        4-neighborhood of a X by Y grid.
+        '''
+        if alive is None:
+            alive = np.ones(X*Y, dtype=bool)
+        ids = np.arange(X*Y).reshape(Y, X)
+        pairs = [(ids[1:, :], ids[:-1, :]), (ids[:-1, :], ids[1:, :]), (ids[:, 1:], ids[:, :-1]), (ids[:, :-1], ids[:, 1:])]
+        owners = np.concatenate([a.ravel() for a, _ in pairs])
+        neighbors = np.concatenate([b.ravel() for _, b in pairs])
+        return Adjacency.from_edges((Y, X), owners, neighbors, np.asarray(alive, dtype=bool).ravel())
+
+    @staticmethod
+    def from_tiles(tiles:list, shape:tuple) -> 'Adjacency':
+        '''
+        Any topology, read from the neighbors lists of the tiles.
+        '''
+        owners = np.array([tile.id for tile in tiles for _ in tile.neighbors], dtype=int)
+        neighbors = np.array([neighbor.id for tile in tiles for neighbor in tile.neighbors], dtype=int)
+        alive = np.array([tile.is_alive for tile in tiles], dtype=bool)
+        return Adjacency.from_edges(shape, owners, neighbors, alive)
+
+    def neighbor_sum(self, a:np.ndarray, vector:bool = False) -> np.ndarray:
+        '''
+        Sum over the alive neighbors of every tile, same interface as Kernels.neighbor_sum:
+        a is a (..., Y, X) scalar field or a (..., Y, X, 2) vector field.
+        '''
+        spatial = a.ndim - (3 if vector else 2)
+        flat = a.reshape(a.shape[:spatial] + (-1,) + a.shape[spatial + 2:])
+        gathered = np.take(flat, self.neighbors, axis=spatial)
+        out = np.zeros_like(flat)
+        if len(self._starts):
+            index = [slice(None)] * flat.ndim
+            index[spatial] = self.count > 0
+            out[tuple(index)] = np.add.reduceat(gathered, self._starts, axis=spatial)
+        return out.reshape(a.shape)
+
+    def neighbor_count(self) -> np.ndarray:
+        return self.count.reshape(self.shape)
@@ -0,0 +1,212 @@
+from Board import Board
+from BoardState import BoardState
+from Adjacency import Adjacency
+from Tile import Tile
+from Kernels import run_kernel
+from collections.abc import Sequence
+import operator
+import numpy as np
+
+
+class _StateField:
+    '''
+    Descriptor redirecting a tile attribute to its cell in the BoardState arrays.
+    Vector fields are returned as views, so in-place edits reach the board arrays.
+    '''
+    def __init__(self, cast=None):
+        self.cast = cast
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, tile, owner=None):
+        if tile is None:
+            return self
+        value = getattr(tile.state, self.name)[tile.index]
+        if self.cast is not None:
+            return self.cast(value)
+        return value
+
+    def __set__(self, tile, value):
+        getattr(tile.state, self.name)[tile.index] = value
+
+
+class TileView(Tile):
+    '''
+    Thin view of one cell of a BoardState, keeping the Tile API for legacy code (behaviors, drawing, experiments).
+    The state lives in the arrays, so creating a view never changes the cell. The neighbors are looked up in tiles
+    when first needed.
+    '''
+    __slots__ = ('state', 'index', 'tiles', '_neighbors')
+
+    vector = _StateField()
+    vector_translation = _StateField()
+    vector_rotation = _StateField()
+    object_center = _StateField()
+    target_center = _StateField()
+
+    signal_center_excitation_A = _StateField(float)
+    object_angle = _StateField(float)
+    target_angle = _StateField(float)
+
+    is_target = _StateField(bool)
+    is_contact = _StateField(bool)
+    is_alive = _StateField(bool)
+
+    def __init__(self, state:BoardState, x:int, y:int, tiles:'TileList' = None) -> None:
+        self.state = state
+        self.index = (y, x)
+        self.tiles = tiles
+        self._neighbors: list[TileView] = None
+
+        self.id = x + y*state.X
+        self.x = x
+        self.y = y
+        self.tile_size: int = None
+        self.headless = False
+        self._render = None
+        self.knowledge = {}
+        self.knowledge_mode = 'live'
+
+    @property
+    def neighbors(self) -> list['TileView']:
+        if self._neighbors is None:
+            x, y = self.x, self.y
+            neighbors = [(x, y+1), (x, y-1), (x-1, y), (x+1, y)]
+            self._neighbors = [self.tiles[nx + ny*self.state.X] for nx, ny in neighbors
+                               if 0 <= nx < self.state.X and 0 <= ny < self.state.Y]
+        return self._neighbors
+
+
+class TileList(Sequence):
+    '''
+    Board.tiles of an ArrayBoard. The TileViews are created on first access and kept, so a large board
+    costs no Python objects for the tiles the simulation never touches.
+    '''
+    def __init__(self, board:'ArrayBoard'):
+        self.board = board
+        self.views: dict[int, TileView] = {}
+
+    def __len__(self) -> int:
+        return self.board.X*self.board.Y
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = operator.index(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("tile index out of range")
+        view = self.views.get(i)
+        if view is None:
+            view = self.board.new_tile(i % self.board.X, i // self.board.X)
+            view.tile_size = self.board.TILE_SIZE
+            view.headless = self.board.headless
+            self.views[i] = view
+        return view
+
+    def copy(self) -> list[TileView]:
+        return list(self)
+
+
+class ArrayBoard(Board):
+    '''
+    Board backed by a BoardState: all per-tile state lives in contiguous arrays and Board.tiles are TileViews,
+    created when first used (see TileList).
+    '''
+    def __init__(self, N:int, TILE_SIZE:int, kernel=None, headless:bool = False):
+        self.state = BoardState(N)
+        self.kernel = kernel
+        #Kernels gather the neighbors through the CSR index instead of shifted arrays
+        self.use_adjacency = False
+        super().__init__(N, TILE_SIZE, headless)
+
+    def act(self):
+        if self.kernel is None:
+            return super().act()
+        run_kernel(self.kernel, self.state, self.scheduler, adjacency=self.adjacency if self.use_adjacency else None,
+                   parameters=self.parameters, rng=self.np_rng)
+
+    def build_adjacency(self) -> Adjacency:
+        return Adjacency.grid(self.X, self.Y, self.state.is_alive)
+
+    def create_tiles(self) -> TileList:
+        return TileList(self)
+
+    def create_neighbors(self):
+        #TileViews find their neighbors when needed
+        pass
+
+    def new_tile(self, x:int, y:int) -> TileView:
+        return TileView(self.state, x, y, self.tiles)
+
+    def kill_tiles(self, ratio:float):
+        '''
+        Same draw as Board.kill_tiles, without creating the tiles.
+        '''
+        order = list(range(len(self.tiles)))
+        self.rng.shuffle(order)
+        order = np.array(order[::-1], dtype=int)
+        to_kill = order[~self.state.is_target.ravel()[order]][:int(len(self.tiles) * ratio)]
+        for i in to_kill:
+            if i in self.tiles.views:
+                self.tiles[i].die()
+        ys, xs = np.divmod(to_kill, self.X)
+        self.state.is_alive[ys, xs] = False
+        for name in ('vector', 'vector_translation', 'vector_rotation'):
+            getattr(self.state, name)[ys, xs] = 0
+        self.invalidate_adjacency()
+        self.wake()
+
+    def get_targets(self) -> list[bool]:
+        return self.state.is_target.ravel().tolist()
+
+    @property
+    def net_vectors(self):
+        return np.linalg.norm(self.state.vector.sum(axis=(0, 1)))
+
+    def vectors_to_center(self):
+        self.state.vector[..., 0] = self.X//2 - self.state.x
+        self.state.vector[..., 1] = self.Y//2 - self.state.y
+
+    def vectors_to_right(self):
+        self.state.vector[...] = (1, 0)
+
+    def vectors_to_none(self):
+        self.state.vector[...] = 0
+
+    def vectors_to_random(self):
+        for t in self.tiles:
+            t.vector = np.array([self.rng.randint(-5,5), self.rng.randint(-5,5)], dtype=float)
+
+    def count_coverage(self):
+        self.target_count = int(np.count_nonzero(self.state.is_target))
+        self.covered_count = int(np.count_nonzero(self.state.is_target & self.state.is_contact))
+
+    def set_contacts(self, xs:np.array, ys:np.array, contact:np.array) -> list[TileView]:
+        alive = self.state.is_alive[ys, xs]
+        xs, ys = np.asarray(xs)[alive], np.asarray(ys)[alive]
+        contact = np.asarray(contact, dtype=bool)[alive]
+        target = self.state.is_target[ys, xs]
+        previous = self.state.is_contact[ys, xs]
+        self.covered_count += int(np.count_nonzero(contact & target)) - int(np.count_nonzero(previous & target))
+        self.state.is_contact[ys, xs] = contact
+        ids = ys*self.X + xs
+        self.wake([self.tiles[i] for i in ids[contact != previous]])
+        self.mark_dirty(ids[contact].tolist())
+        self.contact_ids = ids[contact]
+        return [self.tiles[i] for i in self.contact_ids]
+
+    def get_vectors(self, ids:np.array) -> np.array:
+        return self.state.vector.reshape(-1, 2)[ids]
+
+    def get_system_data(self):
+        data = {
+        'contacts' : self.state.is_contact.ravel().tolist(),
+        'vectors_translation' : self.state.vector_translation.reshape(-1, 2).tolist(),
+        'vectors_rotation' : self.state.vector_rotation.reshape(-1, 2).tolist(),
+        'vectors' : self.state.vector.reshape(-1, 2).tolist(),
+        'signals_A' : self.state.signal_center_excitation_A.ravel().tolist(),
+        }
+        return data
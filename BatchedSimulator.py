@@ -0,0 +1,104 @@
+import os
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+from Simulator import Simulator
+from BoardState import BoardState
+from Kernels import run_kernel
+from TunableParameters import TunableParameters
+import numpy as np
+import random
+
+
+class BatchedSimulator:
+    '''
+    Steps K independent environments in lockstep. The board states are stacked with a leading
+    environment dimension and advanced with a single call to a grid kernel (see Kernels.py),
+    while each environment keeps its own object, target, data and end condition.
+    Finished environments are masked out of the kernel and stop recording data.
+
+    All the setups must share the board size N, the kernel and the scheduler, anything else (symbol, resolution,
+    dead_tiles, max_iterations) can differ between environments.
+    Each environment has its own generators, seeded with its seed, and the colorings of the kernel step draw from rng
+    (the global NumPy generator by default).
+    parameters: shared by all the environments, or a list with the parameters of each environment. In the latter case
+    the kernel reads them as (K, 1, 1) arrays (see TunableParameters.stack), so a batch can evaluate many parameter
+    settings at once; environments with the same seed and setup start from the same board, object and target.
+    '''
+    def __init__(self, setups:list[dict], seeds:list[int] = None, parameters:TunableParameters | list = None, rng = None):
+        if seeds is None:
+            seeds = [random.randint(0, 1000000) for _ in setups]
+        if len(seeds) != len(setups):
+            raise ValueError("One seed per setup is needed")
+        if isinstance(parameters, (list, tuple)):
+            if len(parameters) != len(setups):
+                raise ValueError("One set of parameters per setup is needed")
+            environment_parameters = parameters
+            self.parameters = TunableParameters.stack(parameters)
+        else:
+            self.parameters = parameters or TunableParameters
+            environment_parameters = [self.parameters]*len(setups)
+        self.rng = rng if rng is not None else np.random
+
+        self.simulators: list[Simulator] = []
+        for setup, seed, simulator_parameters in zip(setups, seeds, environment_parameters):
+            setup = dict(setup, engine='arrays', visualize=False, save_animation=False)
+            simulator = Simulator(setup, parameters=simulator_parameters, rng=random.Random(seed), np_rng=np.random.RandomState(seed))
+            simulator.board.count_coverage()
+            self.simulators.append(simulator)
+
+        kernels = {simulator.board.kernel for simulator in self.simulators}
+        if len(kernels) != 1 or None in kernels:
+            raise ValueError("All the setups must use the same grid kernel, setup['kernel']")
+        self.kernel = kernels.pop()
+        schedulers = {simulator.board.scheduler for simulator in self.simulators}
+        if len(schedulers) != 1:
+            raise ValueError("All the setups must use the same scheduler, setup['scheduler']")
+        self.scheduler = schedulers.pop()
+
+        self.state = BoardState.stack([simulator.board.state for simulator in self.simulators])
+        self.active = np.ones(len(self.simulators), dtype=bool)
+        self.iterations = np.zeros(len(self.simulators), dtype=int)
+        self.results = [None] * len(self.simulators)
+
+    def __len__(self) -> int:
+        return len(self.simulators)
+
+    def step(self) -> None:
+        running = np.flatnonzero(self.active)
+        for k in running:
+            simulator = self.simulators[k]
+            if simulator.setup['save_data']: simulator.record_data()
+
+        run_kernel(self.kernel, self.state, self.scheduler, self.active[:, None, None], parameters=self.parameters, rng=self.rng)
+
+        for k in running:
+            simulator = self.simulators[k]
+            simulator.update_object()
+            if simulator.end_condition():
+                self.finish(k)
+                continue
+            self.iterations[k] += 1
+            if self.iterations[k] > simulator.setup['max_iterations']:
+                self.finish(k)
+
+    def finish(self, k:int) -> None:
+        simulator = self.simulators[k]
+        self.active[k] = False
+        if simulator.setup['save_data']:
+            self.results[k] = simulator.dh.data
+
+    def run_simulation(self) -> list:
+        while self.active.any():
+            self.step()
+        return self.results
+
+    @classmethod
+    def parameter_grid(cls, setups:list[dict], seeds:list[int], parameters:list, rng = None) -> 'BatchedSimulator':
+        '''
+        Batch of every parameter setting times every (setup, seed) pair, ordered by setting then pair.
+        The runs of a pair start from the same conditions for all the settings (common random numbers).
+        '''
+        if len(seeds) != len(setups):
+            raise ValueError("One seed per setup is needed")
+        return cls([setup for _ in parameters for setup in setups],
+                   [seed for _ in parameters for seed in seeds],
+                   [p for p in parameters for _ in setups], rng)
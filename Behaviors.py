@@ -4,8 +4,12 @@ from TunableParameters import TunableParameters
 import numpy as np
 
 class Behaviors:
+    '''
+    Behaviors of the tiles. They are executed with the parameters of their simulation (see Board.tile_behavior),
+    or with the class values of TunableParameters when set as Tile.execute_behavior.
+    '''
     @staticmethod
-    def information_diffusion(tile:Tile):
+    def information_diffusion(tile:Tile, parameters:TunableParameters = TunableParameters):
         if not tile.is_alive:
             return
 
@@ -83,7 +87,7 @@ class Behaviors:
             tile.vector = tile.vector_translation
 
     @staticmethod
-    def behavior_swarmy_rotation(tile:Tile) -> None:
+    def behavior_swarmy_rotation(tile:Tile, parameters:TunableParameters = TunableParameters) -> None:
         TILE_SIZE = 1
 
         if tile.is_target:
@@ -93,15 +97,15 @@ class Behaviors:
         if len(tile.target_neighbors)>0: #Membrane
             # CALCULATE EXCITATION SIGNAL
             s_val = tile.signal_center_excitation_A
-            s_val = s_val * TunableParameters.shrink_x
+            s_val = s_val * parameters.shrink_x
             if tile.is_contact and not tile.is_target:
-                s_val = s_val + TunableParameters.excitation_factor * (1.0 - TunableParameters.shrink_x)
+                s_val = s_val + parameters.excitation_factor * (1.0 - parameters.shrink_x)
             tile.signal_center_excitation_A = s_val
 
             avg_target_neighbors = np.mean([neighbor.center for neighbor in tile.target_neighbors], axis=0)
             tile.vector_translation = avg_target_neighbors - tile.center
 
-            if tile.signal_center_excitation_A > TunableParameters.threshold_x_a:
+            if tile.signal_center_excitation_A > parameters.threshold_x_a:
 
                 if tile.vector_translation[0] == 0:
                     if tile.vector_translation[1] > 0:
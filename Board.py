@@ -1,85 +1,185 @@
 import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 from Tile import Tile
-import pygame
+from Adjacency import Adjacency
+from TunableParameters import TunableParameters
+import functools
 import random
 import numpy as np
 from typing import Any
 
 
 class Board:
-    def __init__(self, N:int, TILE_SIZE:int):
+    def __init__(self, N:int, TILE_SIZE:int, headless:bool = False):
+        '''
+        headless: the tiles get NumPy rects (Geometry.Rect) and no masks or sensors, so pygame is never imported.
+        Such a board cannot be drawn.
+        '''
         self.TILE_SIZE = TILE_SIZE
+        self.headless = headless
         self.X = N
         self.Y = N
+
+        #Behavior, parameters and random generators of the simulation, see Simulator.
+        #By default Tile.execute_behavior, the class values of TunableParameters and the global generators
+        self.behavior = None
+        self.parameters = TunableParameters
+        self.rng = random
+        self.np_rng = np.random
         self.tiles: list[Tile] = self.create_tiles()
         self.create_neighbors()
 
+        #Running counters for the coverage, see count_coverage
+        self.target_count = 0
+        self.covered_count = 0
+        #Ids of the tiles in contact with the object, in the order of self.tiles
+        self.contact_ids = np.zeros(0, dtype=int)
+
+        self._adjacency: Adjacency = None
+
+        #Active-set scheduling, see act_active_set. 'all' executes every alive tile at every step
+        self.scheduler = 'all'
+        self.active_tolerance = 1e-3
+        #None means every tile
+        self.dirty: set[int] = None
+        self.active_count = 0
+
+    @property
+    def adjacency(self) -> Adjacency:
+        '''
+        CSR index of the alive neighbors of the tiles, rebuilt only after tiles die.
+        '''
+        if self._adjacency is None:
+            self._adjacency = self.build_adjacency()
+        return self._adjacency
+
+    def build_adjacency(self) -> Adjacency:
+        return Adjacency.from_tiles(self.tiles, (self.Y, self.X))
+
+    def invalidate_adjacency(self):
+        self._adjacency = None
+
     @property
     def net_vectors(self):
         sume = sum(np.array([tile.vector for tile in self.tiles]))
         return np.linalg.norm(sume)
     
+    def set_knowledge_mode(self, mode:str):
+        '''
+        'live' (default) or 'snapshot', see Tile.update_knowledge.
+        '''
+        for tile in self.tiles:
+            tile.set_knowledge_mode(mode)
+
+    def tile_behavior(self):
+        '''
+        Function executing the behavior on one tile: self.behavior with self.parameters,
+        or Tile.execute_behavior when the board has no behavior.
+        '''
+        if self.behavior is None:
+            return lambda tile: tile.execute_behavior()
+        return functools.partial(self.behavior, parameters=self.parameters)
+
     def update_knowledge(self):
         tiles = self.tiles.copy()
-        random.shuffle(tiles)
+        self.rng.shuffle(tiles)
         for tile in tiles:
             tile.update_knowledge()
     
     def reasoning(self):
         tiles = self.tiles.copy()
-        random.shuffle(tiles)
+        self.rng.shuffle(tiles)
         for tile in tiles:
             tile.reasoning()
 
     def act(self):
+        if self.scheduler == 'active_set':
+            return self.act_active_set()
         tiles = self.tiles.copy()
-        random.shuffle(tiles)
+        self.rng.shuffle(tiles)
+        execute_behavior = self.tile_behavior()
         for tile in tiles:
             if tile.is_alive:
                 tile.update_knowledge()
-                tile.execute_behavior()
+                execute_behavior(tile)
+
+    def act_active_set(self):
+        '''
+        Execute only the dirty tiles, in random order. A tile whose state changed by more than
+        active_tolerance marks itself and its neighbors dirty for the next step, so the settled
+        part of the board is skipped while the fixed points stay the same as with act.
+        '''
+        ids = range(len(self.tiles)) if self.dirty is None else sorted(self.dirty)
+        tiles = [self.tiles[i] for i in ids]
+        self.rng.shuffle(tiles)
+        self.dirty = set()
+        self.active_count = 0
+        execute_behavior = self.tile_behavior()
+        for tile in tiles:
+            if not tile.is_alive:
+                continue
+            before = self.tile_state(tile)
+            tile.update_knowledge()
+            execute_behavior(tile)
+            self.active_count += 1
+            if max(abs(a - b) for a, b in zip(self.tile_state(tile), before)) > self.active_tolerance:
+                self.wake([tile])
+
+    @staticmethod
+    def tile_state(tile:Tile) -> tuple:
+        #What the neighbors read (vector translation and target) and the memory of the tile (signal).
+        #vector and vector_rotation only depend on them and on the contact, whose tiles are always executed
+        return (float(tile.vector_translation[0]), float(tile.vector_translation[1]),
+                float(tile.target_center[0]), float(tile.target_center[1]),
+                float(tile.target_angle), float(tile.signal_center_excitation_A))
+
+    def wake(self, tiles:list[Tile] = None):
+        '''
+        Mark the tiles and their neighbors to be executed at the next step of act_active_set, all the tiles when None.
+        '''
+        if tiles is None:
+            self.dirty = None
+            return
+        for tile in tiles:
+            self.mark_dirty([tile.id])
+            self.mark_dirty(neighbor.id for neighbor in tile.neighbors)
+
+    def mark_dirty(self, ids):
+        #Only the given tiles, not their neighbors
+        if self.dirty is not None:
+            self.dirty.update(ids)
 
     def execute_behavior(self):
         tiles = self.tiles.copy()
-        random.shuffle(tiles)
+        self.rng.shuffle(tiles)
+        execute_behavior = self.tile_behavior()
         for tile in tiles:
-            tile.execute_behavior()
+            execute_behavior(tile)
     
     def create_tiles(self):
+        '''
+        The rendering members of the tiles (rect, masks, sensors) are created when first drawn, see Tile.create_render.
+        '''
         tiles = []
         for y in range(self.Y):
             for x in range(self.X):
-                tile = Tile()
-                tile.x = x
-                tile.y = y
-                tile.rect = pygame.Rect(x*self.TILE_SIZE, y*self.TILE_SIZE, self.TILE_SIZE, self.TILE_SIZE)
-                tile.mask = pygame.mask.from_surface(pygame.Surface((self.TILE_SIZE, self.TILE_SIZE)))
+                tile = self.new_tile(x, y)
                 tile.vector = np.array([0, 0], dtype=float)
                 tile.id = len(tiles)
+                tile.tile_size = self.TILE_SIZE
+                tile.headless = self.headless
                 tiles.append(tile)
-
-                #Central pixel of the tile
-                tile.center_rect = pygame.Rect(x*self.TILE_SIZE + self.TILE_SIZE//2, y*self.TILE_SIZE + self.TILE_SIZE//2, 1, 1)
-                tile.center_mask = pygame.mask.from_surface(pygame.Surface((1, 1)))
-  
-                #Sensors
-                n_sensor = 1
-                padding = self.TILE_SIZE//6
-                x_sensor = np.linspace(padding, self.TILE_SIZE-padding, n_sensor, dtype=int)
-                y_sensor = np.linspace(padding, self.TILE_SIZE-padding, n_sensor, dtype=int)
-                for xs in x_sensor:
-                    for ys in y_sensor:
-                        sx = x*self.TILE_SIZE + xs
-                        sy = y*self.TILE_SIZE + ys
-                        tile.sensors_centers.append(pygame.Rect(sx, sy, 1, 1))
-                        #tile.sensors_centers.append(pygame.Rect(xs*self.TILE_SIZE, ys*self.TILE_SIZE, 1, 1))
-                        tile.sensors_masks.append(pygame.mask.from_surface(pygame.Surface((1, 1))))
         return tiles
 
+    def new_tile(self, x:int, y:int) -> Tile:
+        tile = Tile()
+        tile.x = x
+        tile.y = y
+        return tile
+
     def kill_tiles(self, ratio:float):
         tiles = self.tiles.copy()
-        random.shuffle(tiles)
+        self.rng.shuffle(tiles)
 
         to_kill = int(len(tiles) * ratio)
         while to_kill > 0:
@@ -91,12 +191,27 @@ class Board:
             else:
                 tile.die()
                 to_kill -= 1
+        self.invalidate_adjacency()
+        self.wake()
                 
     def get_tile(self, x:int, y:int):
         if x < 0 or x >= self.X or y < 0 or y >= self.Y:
             return None
         return self.tiles[x + y*self.Y]
      
+    def get_tiles_in_rect(self, rect) -> tuple[np.array, np.array]:
+        '''
+        Coordinates (xs, ys) of the tiles whose central pixel lies inside the rect, in the order of self.tiles.
+        The rect can be any object with left, top, right and bottom.
+        '''
+        half = self.TILE_SIZE//2
+        x0 = max(0, -((half - rect.left)//self.TILE_SIZE))
+        y0 = max(0, -((half - rect.top)//self.TILE_SIZE))
+        x1 = min(self.X, (rect.right - 1 - half)//self.TILE_SIZE + 1)
+        y1 = min(self.Y, (rect.bottom - 1 - half)//self.TILE_SIZE + 1)
+        ys, xs = np.mgrid[y0:max(y0, y1), x0:max(x0, x1)]
+        return xs.ravel(), ys.ravel()
+
     def create_neighbors(self):
         for tile in self.tiles:
             x, y = tile.get_coordinates()
@@ -120,22 +235,18 @@ class Board:
 
     def vectors_to_random(self):
         for t in self.tiles:
-            t.vector = np.array([random.randint(-5,5), random.randint(-5,5)], dtype=float)
+            t.vector = np.array([self.rng.randint(-5,5), self.rng.randint(-5,5)], dtype=float)
 
     def draw(self, window):
+        import pygame
         setup = {
             'draw_sensors': False,
-            'target_color': (255, 0, 0),
         }
         
         for tile in self.tiles:
             if not tile.is_alive:
                 continue
 
-            #TODO: im not sure why this is needed
-            if tile.is_target:
-                tile.color = setup['target_color']
-            
             pygame.draw.rect(window, tile.color, tile.rect, width=self.TILE_SIZE//10)
             
             vector = tile.vector
@@ -163,10 +274,66 @@ class Board:
                     pygame.draw.circle(window, (255, 255, 255), sensor.center, 1)
 
     def get_coverage(self):
+        #print(f'Contacts: {self.covered_count}, Target tiles: {self.target_count}, Coverage: {self.covered_count/self.target_count}')
+        return self.covered_count/self.target_count
+
+    def count_coverage(self):
+        '''
+        Recount the target and covered target tiles. Needed after setting targets or contacts
+        directly on the tiles, set_contacts keeps the counters up to date.
+        '''
         target_tiles = [tile for tile in self.tiles if tile.is_target]
         contacts = [tile for tile in target_tiles if tile.is_contact]
-        #print(f'Contacts: {len(contacts)}, Target tiles: {len(target_tiles)}, Coverage: {len(contacts)/len(target_tiles)}')
-        return len(contacts)/len(target_tiles)
+        self.target_count = len(target_tiles)
+        self.covered_count = len(contacts)
+
+    def set_contacts(self, xs:np.array, ys:np.array, contact:np.array) -> list[Tile]:
+        '''
+        Set the contact state of the tiles at the given coordinates, dead tiles are never in contact.
+        Only the tiles that change are touched, they are woken up for act_active_set. Returns the tiles in contact, in the order of self.tiles.
+        '''
+        contact_tiles = []
+        for x, y, in_contact in zip(xs, ys, contact):
+            tile = self.tiles[x + y*self.Y]
+            if not tile.is_alive:
+                continue
+            if in_contact:
+                contact_tiles.append(tile)
+                #The object information of the contact tiles changes at every step
+                self.mark_dirty([tile.id])
+            if tile.is_contact == in_contact:
+                continue
+            self.wake([tile])
+            if in_contact:
+                tile.set_as_contact()
+            else:
+                tile.set_as_no_contact()
+            if tile.is_target:
+                self.covered_count += 1 if in_contact else -1
+        self.contact_ids = np.array([tile.id for tile in contact_tiles], dtype=int)
+        return contact_tiles
+
+    def get_vectors(self, ids:np.array) -> np.array:
+        '''
+        Vectors of the tiles ids, shaped (n, 2).
+        '''
+        return np.array([self.tiles[i].vector for i in ids], dtype=float).reshape(-1, 2)
+
+    def force_sums(self, ids:np.array, center:np.array) -> np.array:
+        '''
+        Sums of (fx, fy, torque) of the vectors of the tiles ids around center (pixels), see Simulator.calculate_forces.
+        '''
+        vectors = self.get_vectors(ids)
+        tile_centers = np.stack([ids % self.X, ids // self.X], axis=-1)*self.TILE_SIZE + self.TILE_SIZE//2
+
+        r = center - tile_centers
+        length = np.linalg.norm(r, axis=-1, keepdims=True)
+        r = np.divide(r, length, out=np.zeros(r.shape), where=length != 0)
+        torque = r[:, 0]*vectors[:, 1] - r[:, 1]*vectors[:, 0]
+        return np.column_stack([vectors, torque]).sum(axis=0)
+
+    def get_targets(self) -> list[bool]:
+        return [tile.is_target for tile in self.tiles]
 
     def get_system_data(self):
         data = {
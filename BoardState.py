@@ -0,0 +1,69 @@
+import numpy as np
+
+
+class BoardState:
+    '''
+    Struct-of-arrays storage of the per-tile state of a board.
+    Scalar fields are shaped (Y, X) and vector fields (Y, X, 2), both indexed as [y, x],
+    so the flattened row-major index of a tile matches its position in Board.tiles.
+    '''
+    VECTOR_FIELDS = ('vector', 'vector_translation', 'vector_rotation', 'object_center', 'target_center')
+    SCALAR_FIELDS = ('signal_center_excitation_A', 'object_angle', 'target_angle')
+    FLAG_FIELDS = ('is_target', 'is_contact', 'is_alive')
+
+    def __init__(self, N:int):
+        self.X = N
+        self.Y = N
+
+        for name in self.VECTOR_FIELDS:
+            setattr(self, name, np.zeros((self.Y, self.X, 2), dtype=float))
+        for name in self.SCALAR_FIELDS:
+            setattr(self, name, np.zeros((self.Y, self.X), dtype=float))
+        for name in self.FLAG_FIELDS:
+            setattr(self, name, np.zeros((self.Y, self.X), dtype=bool))
+        self.is_alive[...] = True
+
+        #Coordinates of the tiles, they never change
+        self.y, self.x = np.mgrid[0:self.Y, 0:self.X]
+        self.center = np.stack([self.x, self.y], axis=-1).astype(float)
+
+    @property
+    def shape(self) -> tuple:
+        return (self.Y, self.X)
+
+    @property
+    def fields(self) -> tuple:
+        return self.VECTOR_FIELDS + self.SCALAR_FIELDS + self.FLAG_FIELDS
+
+    @staticmethod
+    def stack(states:list['BoardState']) -> 'BoardState':
+        '''
+        Build a batched state with a leading environment dimension (K, Y, X[, 2]) from K states of the same size.
+        The given states are rebound to views of their slice, so their boards keep reading and writing the batch.
+        '''
+        if len({state.shape for state in states}) != 1:
+            raise ValueError("All the states of a batch must have the same size")
+        batch = BoardState.__new__(BoardState)
+        batch.X, batch.Y = states[0].X, states[0].Y
+        batch.x, batch.y, batch.center = states[0].x, states[0].y, states[0].center
+        for name in batch.fields:
+            setattr(batch, name, np.stack([getattr(state, name) for state in states]))
+            for k, state in enumerate(states):
+                setattr(state, name, getattr(batch, name)[k])
+        return batch
+
+    def rows(self, y0:int, y1:int) -> 'BoardState':
+        '''
+        Copy of the rows y0:y1 of a single board, the tiles keep their board coordinates.
+        '''
+        band = BoardState.__new__(BoardState)
+        band.X, band.Y = self.X, y1 - y0
+        band.x, band.y, band.center = self.x[y0:y1], self.y[y0:y1], self.center[y0:y1]
+        for name in self.fields:
+            setattr(band, name, getattr(self, name)[y0:y1].copy())
+        return band
+
+    def copy(self) -> 'BoardState':
+        state = BoardState.__new__(BoardState)
+        state.__dict__.update({k: v.copy() if isinstance(v, np.ndarray) else v for k, v in self.__dict__.items()})
+        return state
@@ -0,0 +1,163 @@
+from collections import deque
+
+
+class RollingWindow:
+    '''
+    Last `length` values of a series, split into an older and a newer half with running sums,
+    so every append costs the same whatever the length. The sums are recomputed once per
+    `length` appends to keep the floating point drift bounded.
+    '''
+    def __init__(self, length:int):
+        if length < 2:
+            raise ValueError("A rolling window needs a length of at least 2")
+        self.length = length
+        self.older = deque(maxlen=length//2)
+        self.newer = deque(maxlen=length - length//2)
+        self.older_sum = 0.0
+        self.newer_sum = 0.0
+        self.appends = 0
+
+    def __len__(self) -> int:
+        return len(self.older) + len(self.newer)
+
+    @property
+    def full(self) -> bool:
+        return len(self) == self.length
+
+    def append(self, value:float) -> None:
+        if len(self.newer) == self.newer.maxlen:
+            moved = self.newer.popleft()
+            self.newer_sum -= moved
+            if len(self.older) == self.older.maxlen:
+                self.older_sum -= self.older.popleft()
+            self.older.append(moved)
+            self.older_sum += moved
+        self.newer.append(value)
+        self.newer_sum += value
+
+        self.appends += 1
+        if self.appends % self.length == 0:
+            self.older_sum = sum(self.older)
+            self.newer_sum = sum(self.newer)
+
+    def clear(self) -> None:
+        self.older.clear()
+        self.newer.clear()
+        self.older_sum = 0.0
+        self.newer_sum = 0.0
+        self.appends = 0
+
+    @property
+    def older_mean(self) -> float:
+        return self.older_sum/len(self.older)
+
+    @property
+    def newer_mean(self) -> float:
+        return self.newer_sum/len(self.newer)
+
+    @property
+    def mean(self) -> float:
+        return (self.older_sum + self.newer_sum)/len(self)
+
+
+class Criterion:
+    '''
+    Stop rule on one series (key) given to ConvergenceDetector.update. It is never met before its window is full.
+    '''
+    def __init__(self, key:str, window:int = 100, tolerance:float = 5):
+        self.key = key
+        self.tolerance = tolerance
+        self.window = RollingWindow(window)
+
+    def update(self, value:float) -> bool:
+        self.window.append(value)
+        return self.window.full and self.met()
+
+    def met(self) -> bool:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        self.window.clear()
+
+
+class RelativeChange(Criterion):
+    '''
+    The averages of the two halves of the window differ by less than tolerance, in percent of their mean.
+    '''
+    def met(self) -> bool:
+        avg_1 = self.window.older_mean
+        avg_2 = self.window.newer_mean
+        if avg_1 == 0 and avg_2 == 0:
+            return True
+        return abs(avg_1 - avg_2) / ((avg_1 + avg_2) / 2) * 100 < self.tolerance
+
+
+class AbsoluteError(Criterion):
+    '''
+    The average of the window is below tolerance.
+    '''
+    def met(self) -> bool:
+        return self.window.mean < self.tolerance
+
+
+class Plateau(Criterion):
+    '''
+    The averages of the two halves of the window differ by less than tolerance, e.g. a coverage that stopped growing.
+    '''
+    def met(self) -> bool:
+        return abs(self.window.newer_mean - self.window.older_mean) < self.tolerance
+
+
+class ConvergenceDetector:
+    '''
+    Combination of stop rules fed once per step, e.g.
+        detector = ConvergenceDetector([RelativeChange('position'), Plateau('coverage', 50, 0.01)])
+        if detector.update(position=err_pos, coverage=coverage): ...
+    mode 'all' stops when every criterion is met, 'any' when one of them is.
+    '''
+    CRITERIA = {
+        'relative_change': RelativeChange,
+        'absolute_error': AbsoluteError,
+        'plateau': Plateau,
+    }
+
+    #End condition of the paper: position and angle errors settled within 5% over the last 100 steps
+    DEFAULT = [
+        {'criterion': 'relative_change', 'key': 'position', 'window': 100, 'tolerance': 5},
+        {'criterion': 'relative_change', 'key': 'angle', 'window': 100, 'tolerance': 5},
+    ]
+
+    def __init__(self, criteria:list[Criterion], mode:str = 'all'):
+        if mode not in ('all', 'any'):
+            raise ValueError(f"Unknown convergence mode {mode}, use 'all' or 'any'")
+        self.criteria = criteria
+        self.mode = mode
+
+    @property
+    def keys(self) -> set[str]:
+        return {criterion.key for criterion in self.criteria}
+
+    @staticmethod
+    def from_spec(spec:list[dict] = None, mode:str = 'all') -> 'ConvergenceDetector':
+        '''
+        Build the detector from a list of dicts {'criterion', 'key', 'window', 'tolerance'}, as found in setup['convergence'].
+        '''
+        if spec is None:
+            spec = ConvergenceDetector.DEFAULT
+        criteria = []
+        for item in spec:
+            item = dict(item)
+            name = item.pop('criterion')
+            if name not in ConvergenceDetector.CRITERIA:
+                raise ValueError(f"Unknown convergence criterion {name}, use one of {list(ConvergenceDetector.CRITERIA)}")
+            criteria.append(ConvergenceDetector.CRITERIA[name](**item))
+        return ConvergenceDetector(criteria, mode)
+
+    def update(self, **values:float) -> bool:
+        #Every criterion is fed at every step, so their windows stay aligned
+        met = [criterion.update(values[criterion.key]) for criterion in self.criteria]
+        return all(met) if self.mode == 'all' else any(met)
+
+    def reset(self) -> None:
+        for criterion in self.criteria:
+            criterion.reset()
@@ -0,0 +1,158 @@
+from ArrayBoard import ArrayBoard
+from BoardState import BoardState
+from TunableParameters import TunableParameters
+from multiprocessing import shared_memory
+import multiprocessing
+import weakref
+import os
+import numpy as np
+
+'''
+Board split in horizontal strips, each one stepped by its own worker process.
+The BoardState arrays live in shared memory: at every step a worker copies its strip plus one halo row
+above and below, runs the grid kernel on it, waits for all the workers to be done reading and writes
+its own rows back. The forces on the object are reduced per strip and summed by the main process.
+'''
+
+#Commands of the workers, in control[0]
+STOP, ACT, FORCES = 0, 1, 2
+
+
+def _share(array:np.ndarray, blocks:list) -> np.ndarray:
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    blocks.append(block)
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    shared[...] = array
+    return shared
+
+def _attach(spec:dict, blocks:list) -> np.ndarray:
+    block = shared_memory.SharedMemory(name=spec['name'])
+    blocks.append(block)
+    return np.ndarray(spec['shape'], dtype=spec['dtype'], buffer=block.buf)
+
+def _spec(array:np.ndarray, block:shared_memory.SharedMemory) -> dict:
+    return {'name': block.name, 'shape': array.shape, 'dtype': array.dtype.str}
+
+def _release(blocks:list, processes:list, unlink:bool) -> None:
+    for process in processes:
+        process.join(timeout=1)
+        if process.is_alive():
+            process.terminate()
+    for block in blocks:
+        if unlink:
+            block.unlink()
+        try:
+            block.close()
+        except BufferError:
+            pass #Arrays still map the block, it is released with them
+
+def _worker(specs:dict, N:int, TILE_SIZE:int, strip:tuple, w:int, kernel, parameters:dict, barrier) -> None:
+    parameters = TunableParameters(**parameters)
+
+    blocks = []
+    state = BoardState(N)
+    for name in state.fields:
+        setattr(state, name, _attach(specs[name], blocks))
+    control = _attach(specs['control'], blocks)
+    partials = _attach(specs['partials'], blocks)
+
+    y0, y1 = strip
+    lo, hi = max(0, y0 - 1), min(N, y1 + 1)
+    own = np.zeros((hi - lo, N), dtype=bool)
+    own[y0 - lo:y1 - lo] = True
+
+    try:
+        while True:
+            barrier.wait()
+            command = int(control[0])
+            if command == STOP:
+                break
+
+            if command == ACT:
+                band = state.rows(lo, hi)
+                barrier.wait() #Every strip has read its halo
+                kernel(band, own, parameters=parameters)
+                for name in state.fields:
+                    getattr(state, name)[y0:y1] = getattr(band, name)[y0 - lo:y1 - lo]
+
+            elif command == FORCES:
+                contact = state.is_contact[y0:y1] & state.is_alive[y0:y1]
+                ys, xs = np.nonzero(contact)
+                vectors = state.vector[y0:y1][ys, xs]
+                tile_centers = np.stack([xs, ys + y0], axis=-1)*TILE_SIZE + TILE_SIZE//2
+                r = control[1:3] - tile_centers
+                length = np.linalg.norm(r, axis=-1, keepdims=True)
+                r = np.divide(r, length, out=np.zeros(r.shape), where=length != 0)
+                torque = r[:, 0]*vectors[:, 1] - r[:, 1]*vectors[:, 0]
+                partials[w] = np.column_stack([vectors, torque]).sum(axis=0)
+
+            barrier.wait()
+    finally:
+        del state, control, partials
+        _release(blocks, [], unlink=False)
+
+
+class DistributedBoard(ArrayBoard):
+    '''
+    ArrayBoard stepped by n_workers processes, each one owning a strip of rows (see the module docstring).
+    It needs a grid kernel. With the synchronous kernels of Kernels the result is the same as a single ArrayBoard,
+    the compiled sequential kernels (NumbaKernels) are only asynchronous inside each strip.
+    The workers start at the first step, so the kernel, the targets and the dead tiles can be set before.
+    '''
+    def __init__(self, N:int, TILE_SIZE:int, kernel=None, headless:bool = False, n_workers:int = None):
+        super().__init__(N, TILE_SIZE, kernel, headless)
+        self.n_workers = n_workers or os.cpu_count()
+        self.processes: list[multiprocessing.Process] = []
+        self.barrier = None
+
+        self.blocks: list[shared_memory.SharedMemory] = []
+        for name in self.state.fields:
+            setattr(self.state, name, _share(getattr(self.state, name), self.blocks))
+        self.control = _share(np.zeros(3), self.blocks)
+        self._finalizer = weakref.finalize(self, _release, self.blocks, self.processes, True)
+
+    def start(self) -> None:
+        if self.kernel is None:
+            raise ValueError("A DistributedBoard needs a grid kernel, setup['kernel']")
+        if self.scheduler != 'all':
+            raise ValueError("A DistributedBoard runs the synchronous kernel step, setup['scheduler'] must be 'all'")
+
+        strips = np.array_split(np.arange(self.Y), min(self.n_workers, self.Y))
+        self.partials = _share(np.zeros((len(strips), 3)), self.blocks)
+        specs = {name: _spec(getattr(self.state, name), block) for name, block in zip(self.state.fields, self.blocks)}
+        specs['control'] = _spec(self.control, self.blocks[len(self.state.fields)])
+        specs['partials'] = _spec(self.partials, self.blocks[-1])
+        parameters = TunableParameters.values(self.parameters)
+
+        self.barrier = multiprocessing.Barrier(len(strips) + 1)
+        for w, rows in enumerate(strips):
+            process = multiprocessing.Process(target=_worker, daemon=True,
+                args=(specs, self.X, self.TILE_SIZE, (int(rows[0]), int(rows[-1]) + 1), w, self.kernel, parameters, self.barrier))
+            process.start()
+            self.processes.append(process)
+
+    def command(self, command:int) -> None:
+        if not self.processes:
+            self.start()
+        self.control[0] = command
+        self.barrier.wait()
+        if command == ACT:
+            self.barrier.wait()
+        self.barrier.wait()
+
+    def act(self):
+        self.command(ACT)
+
+    def force_sums(self, ids:np.array, center:np.array) -> np.array:
+        #The contact tiles are read from the shared state, so ids are not sent to the workers
+        self.control[1:3] = center
+        self.command(FORCES)
+        return self.partials.sum(axis=0)
+
+    def close(self) -> None:
+        #Safe to call again, the workers are only stopped once
+        if self.processes:
+            self.control[0] = STOP
+            self.barrier.wait()
+        self._finalizer()
+        self.processes.clear()
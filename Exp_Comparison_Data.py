@@ -1,7 +1,9 @@
+import os
 import random
-from Simulator import Simulator
-from Tile import Tile
+from Runner import Runner
+from ResultCache import ResultCache
 from Behaviors import Behaviors
+from Kernels import Kernels
 import json
 import _config
 from tqdm import tqdm
@@ -40,24 +42,43 @@ if __name__ == '__main__':
     }
 
     behaviors = [Behaviors.information_diffusion, Behaviors.behavior_swarmy_rotation]
+    # The per-tile behaviors of the paper. The whole-grid kernels [Kernels.information_diffusion, Kernels.swarmy_rotation]
+    # are synchronous versions, only statistically equivalent: their results are saved apart, in RESULTS_PATH/Kernels
+    kernels = [None, None]
     behaviors_names = [_config.INFORMATION_DIFFUSION_NAME, _config.SWARMY_NAME]
     
     symbols = ["I", "O", "T", "J", "L", "S", "Z"]
 
     runs_per_behavior = 100
+    # Sequential stopping: a behavior runs until the 95% confidence intervals of its final errors and coverage are
+    # narrower than the tolerances, between min_runs and runs_per_behavior runs.
+    # None: fixed seeds and symbols from master_seed, runs_per_behavior runs per behavior. Sequential stopping draws other ones
+    tolerances = None #{'position_error': 5, 'angle_error': 5, 'coverage': 0.03}
+    min_runs = 10
+
+    # Runs are spread over the processes of the Runner (all the cores by default), seeded from master_seed.
+    # Finished runs are kept in the cache, rerunning the script only executes the missing ones
+    workers = None
+    master_seed = 0
+    runner = Runner(workers, master_seed, cache=ResultCache(_folders.CACHE_PATH))
 
     results = {}
-    for behavior, behaviors_name in tqdm(zip(behaviors, behaviors_names)):
-        Tile.execute_behavior = behavior
-        results[behaviors_name] = []
-        
-        for run in tqdm(range(runs_per_behavior)):
-            setup['symbol'] = random.choice(symbols)
-            simulator = Simulator(setup)
-            run_data = simulator.run_simulation()
-            results[behaviors_name].append(run_data)
+    for behavior, kernel, behaviors_name in tqdm(zip(behaviors, kernels, behaviors_names)):
+        setup['engine'] = 'arrays' if kernel else 'objects'
+        setup['kernel'] = kernel
+
+        # Same symbols and seeds for every behavior
+        if tolerances is not None:
+            cell = lambda run: dict(setup, symbol = random.Random(runner.cell_seed(0, run, 1)).choice(symbols))
+            results[behaviors_name], = runner.run_sequential([cell], tolerances, min_runs, runs_per_behavior, behavior=behavior, progress=tqdm)
+            continue
+        rng = random.Random(master_seed)
+        setups = [dict(setup, symbol = rng.choice(symbols)) for _ in range(runs_per_behavior)]
+        results[behaviors_name] = runner.run(setups, behavior=behavior, progress=tqdm)
 
-    results_path = f'{_folders.RESULTS_PATH}/results.json'
+    results_folder = f'{_folders.RESULTS_PATH}/Kernels' if any(kernels) else _folders.RESULTS_PATH
+    os.makedirs(results_folder, exist_ok=True)
+    results_path = f'{results_folder}/results.json'
     with open(results_path, 'w') as file:
         json.dump(results, file, indent=4)        
     
@@ -0,0 +1,77 @@
+import time
+import os
+import sys
+import json
+import numpy as np
+from ArrayBoard import ArrayBoard
+from DistributedBoard import DistributedBoard
+from Kernels import Kernels
+
+'''
+Strong and weak scaling of DistributedBoard against the single-process ArrayBoard.
+A step is the kernel step plus the force reduction over a disc of contact tiles, as in a simulation step.
+Strong scaling keeps the board size, weak scaling keeps the tiles per worker.
+'''
+
+def make_board(board_class, N:int, kernel, **kwargs) -> ArrayBoard:
+    board = board_class(N, 10, kernel=kernel, headless=True, **kwargs)
+    y, x = board.state.y, board.state.x
+    board.state.is_target[:] = (x - N//2)**2 + (y - N//2)**2 < (N//8)**2
+    board.state.is_contact[:] = (x - N//4)**2 + (y - N//4)**2 < (N//8)**2
+    board.state.object_center[:] = (N//4, N//4)
+    board.state.target_center[board.state.is_target] = (N//2, N//2)
+    board.contact_ids = np.flatnonzero(board.state.is_contact)
+    return board
+
+def time_steps(board:ArrayBoard, steps:int) -> float:
+    center = np.array([board.X*board.TILE_SIZE//4]*2)
+    board.act() #Warm up, starts the workers
+    begin = time.perf_counter()
+    for _ in range(steps):
+        board.act()
+        board.force_sums(board.contact_ids, center)
+    return (time.perf_counter() - begin)/steps
+
+def measure(N:int, workers:int, kernel, steps:int) -> float:
+    if workers == 0:
+        return time_steps(make_board(ArrayBoard, N, kernel), steps)
+    board = make_board(DistributedBoard, N, kernel, n_workers=workers)
+    try:
+        return time_steps(board, steps)
+    finally:
+        board.close()
+
+if __name__ == '__main__':
+    import _folders
+    experiment_name = '_Distributed_Scaling'
+    _folders.set_experiment_folders(experiment_name)
+
+    N = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    steps = 20
+    kernel = Kernels.information_diffusion
+    max_workers = os.cpu_count()
+    workers = [w for w in (1, 2, 4, 8, 16, 32, 64) if w <= max_workers]
+
+    results = {'cpu_count': max_workers, 'strong': {}, 'weak': {}}
+
+    #Strong scaling: same board, more workers
+    single = measure(N, 0, kernel, steps)
+    results['strong']['single'] = {'N': N, 'seconds_per_step': single}
+    print(f'Strong scaling, N={N}, single process: {single*1e3:.1f} ms/step')
+    for w in workers:
+        seconds = measure(N, w, kernel, steps)
+        results['strong'][w] = {'N': N, 'seconds_per_step': seconds, 'speedup': single/seconds}
+        print(f'    {w:3} workers: {seconds*1e3:8.1f} ms/step  speedup {single/seconds:5.2f}  efficiency {single/seconds/w:5.2f}')
+
+    #Weak scaling: the area grows with the workers
+    print(f'Weak scaling, {N}x{N} tiles per worker')
+    for w in workers:
+        size = int(round(N*np.sqrt(w)))
+        single = measure(size, 0, kernel, steps)
+        seconds = measure(size, w, kernel, steps)
+        results['weak'][w] = {'N': size, 'seconds_per_step': seconds, 'single_seconds_per_step': single, 'speedup': single/seconds}
+        print(f'    {w:3} workers, N={size:5}: {seconds*1e3:8.1f} ms/step  single process {single*1e3:8.1f} ms/step  speedup {single/seconds:5.2f}')
+
+    results_path = f'{_folders.RESULTS_PATH}/results.json'
+    with open(results_path, 'w') as file:
+        json.dump(results, file, indent=4)
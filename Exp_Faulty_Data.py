@@ -1,7 +1,9 @@
+import os
 import random
-from Simulator import Simulator
-from Tile import Tile
+from Runner import Runner
+from ResultCache import ResultCache
 from Behaviors import Behaviors
+from Kernels import Kernels
 import json
 import _config
 from tqdm import tqdm
@@ -41,28 +43,46 @@ if __name__ == '__main__':
     }
 
     behaviors = [Behaviors.information_diffusion, Behaviors.behavior_swarmy_rotation]
+    # The per-tile behaviors of the paper. The whole-grid kernels [Kernels.information_diffusion, Kernels.swarmy_rotation]
+    # are synchronous versions, only statistically equivalent: their results are saved apart, in RESULTS_PATH/Kernels
+    kernels = [None, None]
     behaviors_names = [_config.INFORMATION_DIFFUSION_NAME, _config.SWARMY_NAME]
     faulty_tiles = [i/10 for i in range(0, 10)]
     
     symbols = ["I", "O", "T", "J", "L", "S", "Z"]
 
     runs_per_percent = 100
+    # Sequential stopping: a cell runs until the 95% confidence intervals of its final errors and coverage are
+    # narrower than the tolerances, between min_runs and runs_per_percent runs.
+    # None: fixed seeds and symbols from master_seed, runs_per_percent runs per cell. Sequential stopping draws other ones
+    tolerances = None #{'position_error': 5, 'angle_error': 5, 'coverage': 0.03}
+    min_runs = 10
+
+    # Runs are spread over the processes of the Runner (all the cores by default), seeded from master_seed.
+    # Finished runs are kept in the cache, rerunning the script only executes the missing ones
+    workers = None
+    master_seed = 0
+    runner = Runner(workers, master_seed, cache=ResultCache(_folders.CACHE_PATH))
 
     results = {}
-    for behavior, behaviors_name in tqdm(zip(behaviors, behaviors_names)):
-        Tile.execute_behavior = behavior
-        results[behaviors_name] = []
+    for behavior, kernel, behaviors_name in tqdm(zip(behaviors, kernels, behaviors_names)):
+        setup['engine'] = 'arrays' if kernel else 'objects'
+        setup['kernel'] = kernel
 
-        for percent in tqdm(faulty_tiles):
-            setup['dead_tiles'] = percent
-            
-            for run in tqdm(range(runs_per_percent)):
-                setup['symbol'] = random.choice(symbols)
-                simulator = Simulator(setup)
-                run_data = simulator.run_simulation()
-                results[behaviors_name].append(run_data)
+        # Same symbols and seeds for every behavior, results in the order of the loops
+        if tolerances is not None:
+            cells = [lambda run, i=i, percent=percent: dict(setup, dead_tiles = percent, symbol = random.Random(runner.cell_seed(i, run, 1)).choice(symbols))
+                     for i, percent in enumerate(faulty_tiles)]
+            runs = runner.run_sequential(cells, tolerances, min_runs, runs_per_percent, behavior=behavior, progress=tqdm)
+            results[behaviors_name] = [run_data for cell_runs in runs for run_data in cell_runs]
+            continue
+        rng = random.Random(master_seed)
+        setups = [dict(setup, dead_tiles = percent, symbol = rng.choice(symbols)) for percent in faulty_tiles for _ in range(runs_per_percent)]
+        results[behaviors_name] = runner.run(setups, behavior=behavior, progress=tqdm)
 
-    results_path = f'{_folders.RESULTS_PATH}/faulty.json'
+    results_folder = f'{_folders.RESULTS_PATH}/Kernels' if any(kernels) else _folders.RESULTS_PATH
+    os.makedirs(results_folder, exist_ok=True)
+    results_path = f'{results_folder}/faulty.json'
     with open(results_path, 'w') as file:
         json.dump(results, file, indent=4)        
     
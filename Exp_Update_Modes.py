@@ -0,0 +1,93 @@
+import random
+import time
+from Runner import Runner, run_metrics
+from Behaviors import Behaviors
+from Kernels import Kernels
+import numpy as np
+import json
+import _config
+
+'''
+Convergence of the update orders of the tiles: the shuffled per-tile loop of Board.act,
+the synchronous kernels and the colored kernels (see Kernels.run_kernel).
+'''
+
+def run_statistics(data:dict) -> dict:
+    return dict(iterations = len(data['coverage']), **run_metrics(data))
+
+def summary(runs:list[dict]) -> dict:
+    return {key: (float(np.mean([run[key] for run in runs])), float(np.std([run[key] for run in runs]))) for key in runs[0]}
+
+if __name__ == '__main__':
+    import _folders
+    from tqdm import tqdm
+    experiment_name = '_Update_Modes'
+    _folders.set_experiment_folders(experiment_name)
+
+    setup = {
+        'N' : 20,
+        'TILE_SIZE' : 20,
+        'object': True,
+        'symbol': 'T',
+        'target_shape': True,
+        'show_tetromines' : False,
+        'show_tetromino_contour' : True,
+
+        'resolution': 2,
+
+        'n_random_targets' : 0,
+        'shuffle_targets': False,
+
+        'delay': False,
+        'visualize': False,
+        'headless': True,
+
+        'save_data': True,
+        'data_tiles': False,
+        'data_objet_target': True,
+        'file_name': 'defaultname',
+
+        'dead_tiles': 0,
+        'save_animation': False,
+        'max_iterations': 1000,
+    }
+
+    behaviors = [Behaviors.information_diffusion, Behaviors.behavior_swarmy_rotation]
+    kernels = [Kernels.information_diffusion, Kernels.swarmy_rotation]
+    behaviors_names = [_config.INFORMATION_DIFFUSION_NAME, _config.SWARMY_NAME]
+    # None runs the shuffled per-tile loop
+    schedulers = [None, 'all', 'checkerboard', 'random_coloring']
+
+    symbols = ["I", "O", "T", "J", "L", "S", "Z"]
+
+    runs_per_mode = 30
+    runner = Runner(workers=None, master_seed=0)
+
+    results = {}
+    for behavior, kernel, behaviors_name in zip(behaviors, kernels, behaviors_names):
+        results[behaviors_name] = {}
+        for scheduler in schedulers:
+            setup['engine'] = 'objects' if scheduler is None else 'arrays'
+            setup['kernel'] = None if scheduler is None else kernel
+            setup['scheduler'] = scheduler or 'all'
+            mode = scheduler or 'shuffled'
+
+            #Same symbols and seeds, so same objects and targets, for every mode
+            rng = random.Random(runner.master_seed)
+            setups = [dict(setup, symbol = rng.choice(symbols)) for _ in range(runs_per_mode)]
+            begin = time.time()
+            data = runner.run(setups, behavior=behavior, progress=lambda results, total: tqdm(results, total=total, desc=f'{behaviors_name} {mode}'))
+            runs = [run_statistics(run_data) for run_data in data]
+            steps = sum(run['iterations'] for run in runs)
+
+            results[behaviors_name][mode] = {'runs': runs, 'summary': summary(runs), 'steps_per_second': steps/(time.time() - begin)}
+
+    for behaviors_name, modes in results.items():
+        print(behaviors_name)
+        for mode, result in modes.items():
+            stats = '  '.join(f'{key} {mean:.2f}±{std:.2f}' for key, (mean, std) in result['summary'].items())
+            print(f'    {mode:16} {stats}  steps/s {result["steps_per_second"]:.0f}')
+
+    results_path = f'{_folders.RESULTS_PATH}/results.json'
+    with open(results_path, 'w') as file:
+        json.dump(results, file, indent=4)
@@ -1,5 +1,6 @@
 import random
 from Simulator import Simulator
+from Runner import Runner
 import numpy as np
 
 def trajectories():
@@ -82,7 +83,11 @@ def diffusion_mechanism():
 
     simulator.run_simulation()
 
-def resolution_influence():
+def resolution_influence(workers:int = None, master_seed:int = 0) -> list:
+    '''
+    The runs are independent and executed by a Runner, see Runner.py.
+    The symbols and the seeds of the runs come from master_seed.
+    '''
     setup = {
         'N' : 25,
         'TILE_SIZE' : 20,
@@ -107,6 +112,7 @@ def resolution_influence():
 
         'dead_tiles': 0,
         'save_animation': False,
+        'max_iterations': 1000,
     }
 
     symbols = ["I", "O", "T", "J", "L", "S", "Z"]
@@ -118,19 +124,25 @@ def resolution_influence():
     #runs_per_m = 5
     #resolutions = [3,4,5]
 
+    rng = random.Random(master_seed)
+    setups = []
     for resolution in resolutions:
-        print(f'Resolution: {resolution}')
         for run in range(runs_per_m):
-            setup['symbol'] = random.choice(symbols)
-            setup['resolution'] = resolution
-            setup['file_name'] = f'Resolution/res_{resolution}_run_{run}'
-            seed = random.randint(0, 1000000)
-            random.seed(seed)
-
-            simulator = Simulator(setup)
-            simulator.run_simulation()
-
-def fault_tolerance():
+            setups.append(dict(setup,
+                               symbol = rng.choice(symbols),
+                               resolution = resolution,
+                               file_name = f'Resolution/res_{resolution}_run_{run}'))
+
+    return Runner(workers, master_seed).run(setups)
+
+def fault_tolerance(workers:int = None, master_seed:int = 0, tolerances:dict = None, min_runs:int = 5, max_runs:int = 100) -> list:
+    '''
+    The runs are independent and executed by a Runner, see Runner.py.
+    The symbols and the seeds of the runs come from master_seed.
+    With tolerances, each (resolution, percentage) cell runs between min_runs and max_runs times, until the confidence
+    intervals of its final errors and coverage are narrower than the tolerances (see Runner.run_sequential):
+    the cells without faults stop early and the noisy faulty cells get the runs.
+    '''
 
     setup = {
     'N' : 25,
@@ -154,6 +166,7 @@ def fault_tolerance():
 
     'dead_tiles': 0,
     'save_animation': False,
+    'max_iterations': 1000,
     }
 
     symbols = ["I", "O", "T", "J", "L", "S", "Z"]  
@@ -169,24 +182,35 @@ def fault_tolerance():
     #percentages = [i/10 for i in range(0, 10)]
     #resolutions = [0.5, 0.75, 1, 2, 3, 4, 5]
 
+    runner = Runner(workers, master_seed)
+    if tolerances is not None:
+        cells = [(res, percent) for res in resolutions for percent in percentages]
+        def cell(i, res, percent):
+            return lambda run: dict(setup,
+                                    dead_tiles = percent,
+                                    resolution = res,
+                                    symbol = random.Random(runner.cell_seed(i, run, 1)).choice(symbols),
+                                    file_name = f'Faulty/res_{res}_fau_{percent}_run_{run}')
+        results = runner.run_sequential([cell(i, *c) for i, c in enumerate(cells)], tolerances, min_runs, max_runs)
+        return [run_data for cell_results in results for run_data in cell_results]
+
+    rng = random.Random(master_seed)
+    setups = []
     for res in resolutions:
         for percent in percentages:
-            print(f'Dead percent: {percent}')
-            setup['dead_tiles'] = percent
             for run in range(runs_per_percent):
-                runid = run
-                setup['resolution'] = res
-                setup['symbol'] = random.choice(symbols)
-                setup['file_name'] = f'Faulty/res_{res}_fau_{percent}_run_{runid}'
-                seed = random.randint(0, 1000000)
-                random.seed(seed)
+                setups.append(dict(setup,
+                                   dead_tiles = percent,
+                                   resolution = res,
+                                   symbol = rng.choice(symbols),
+                                   file_name = f'Faulty/res_{res}_fau_{percent}_run_{run}'))
 
-                simulator = Simulator(setup)
-                simulator.run_simulation()
+    return runner.run(setups)
 
 if __name__ == "__main__":
     #diffusion_mechanism()
     #trajectories()
     #resolution_influence()
     fault_tolerance()
+    #fault_tolerance(tolerances = {'position_error': 5, 'angle_error': 5, 'coverage': 0.03})
     pass
\ No newline at end of file
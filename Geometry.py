@@ -0,0 +1,185 @@
+import math
+import numpy as np
+
+'''
+Pure NumPy replacements of the pygame geometry used by the simulation, for the headless engine.
+They follow the integer arithmetic of pygame so both engines produce the same masks and positions.
+Images are 2D arrays indexed as [x, y], like pygame.surfarray.
+'''
+
+def _round(value) -> int:
+    #pygame rounds half away from zero when a float coordinate is assigned
+    value = float(value)
+    return int(math.copysign(math.floor(abs(value) + 0.5), value))
+
+
+class Rect:
+    def __init__(self, x:int, y:int, width:int, height:int):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def __setattr__(self, name, value):
+        if name in ('x', 'y', 'width', 'height'):
+            value = _round(value)
+        object.__setattr__(self, name, value)
+
+    def __repr__(self) -> str:
+        return f"<rect({self.x}, {self.y}, {self.width}, {self.height})>"
+
+    def __eq__(self, other) -> bool:
+        return tuple(self) == tuple(other)
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.width, self.height))
+
+    def copy(self) -> 'Rect':
+        return Rect(self.x, self.y, self.width, self.height)
+
+    @property
+    def left(self) -> int:
+        return self.x
+
+    @property
+    def top(self) -> int:
+        return self.y
+
+    @property
+    def right(self) -> int:
+        return self.x + self.width
+
+    @property
+    def bottom(self) -> int:
+        return self.y + self.height
+
+    @property
+    def size(self) -> tuple:
+        return (self.width, self.height)
+
+    @property
+    def topleft(self) -> tuple:
+        return (self.x, self.y)
+
+    @topleft.setter
+    def topleft(self, value):
+        self.x, self.y = value
+
+    @property
+    def center(self) -> tuple:
+        return (self.x + self.width//2, self.y + self.height//2)
+
+    @center.setter
+    def center(self, value):
+        self.x = _round(value[0]) - self.width//2
+        self.y = _round(value[1]) - self.height//2
+
+    def clamp_ip(self, other:'Rect') -> None:
+        if self.width >= other.width:
+            self.x = other.x + other.width//2 - self.width//2
+        elif self.x < other.x:
+            self.x = other.x
+        elif self.right > other.right:
+            self.x = other.right - self.width
+
+        if self.height >= other.height:
+            self.y = other.y + other.height//2 - self.height//2
+        elif self.y < other.y:
+            self.y = other.y
+        elif self.bottom > other.bottom:
+            self.y = other.bottom - self.height
+
+
+def get_rect(image:np.ndarray) -> Rect:
+    return Rect(0, 0, image.shape[0], image.shape[1])
+
+def load_alpha(path:str) -> np.ndarray:
+    import imageio.v2 as imageio
+    image = imageio.imread(path, pilmode='RGBA')
+    return np.ascontiguousarray(image[..., 3].T)
+
+def scale(image:np.ndarray, size:tuple) -> np.ndarray:
+    '''
+    Nearest neighbor scaling, as pygame.transform.scale.
+    '''
+    width, height = int(size[0]), int(size[1])
+    xs = np.arange(width) * image.shape[0] // width
+    ys = np.arange(height) * image.shape[1] // height
+    return image[np.ix_(xs, ys)]
+
+def rotate(image:np.ndarray, angle:float) -> np.ndarray:
+    '''
+    Counterclockwise rotation in degrees with an enlarged canvas, as pygame.transform.rotate.
+    The empty area of the canvas is filled with zeros.
+    '''
+    angle = float(np.float32(angle)) #pygame takes the angle as a C float
+    if not math.fmod(angle, 90):
+        turns = int(angle // 90) % 4
+        return np.ascontiguousarray(np.rot90(image, -turns))
+
+    radangle = math.radians(angle)
+    sangle = math.sin(radangle)
+    cangle = math.cos(radangle)
+    w, h = image.shape
+    cx, cy, sx, sy = cangle*w, cangle*h, sangle*w, sangle*h
+    nw = int(max(abs(cx + sy), abs(cx - sy), abs(-cx + sy), abs(-cx - sy)))
+    nh = int(max(abs(sx + cy), abs(sx - cy), abs(-sx + cy), abs(-sx - cy)))
+
+    #16.16 fixed point inverse mapping of pygame
+    center_y = nh // 2
+    xd = (w - nw) << 15
+    yd = (h - nh) << 15
+    isin = int(sangle * 65536)
+    icos = int(cangle * 65536)
+    ax = (nw << 15) - int(cangle * ((nw - 1) << 15))
+    ay = (nh << 15) - int(sangle * ((nw - 1) << 15))
+
+    xs = np.arange(nw, dtype=np.int64)[:, None]
+    ys = np.arange(nh, dtype=np.int64)[None, :]
+    dx = ax + isin * (center_y - ys) + xd + icos * xs
+    dy = ay - icos * (center_y - ys) + yd + isin * xs
+    inside = (dx >= 0) & (dy >= 0) & (dx <= (w << 16) - 1) & (dy <= (h << 16) - 1)
+
+    rotated = np.zeros((nw, nh), dtype=image.dtype)
+    rotated[inside] = image[dx[inside] >> 16, dy[inside] >> 16]
+    return rotated
+
+def mask_centroid(mask:np.ndarray) -> tuple:
+    xs, ys = np.nonzero(mask)
+    if len(xs) == 0:
+        return (0, 0)
+    return (int(xs.sum()) // len(xs), int(ys.sum()) // len(ys))
+
+def mask_outline(mask:np.ndarray) -> list:
+    '''
+    Boundary pixels of the first connected region of the mask, traced clockwise from its top-left pixel
+    back to it, as pygame.mask.Mask.outline.
+    '''
+    width, height = mask.shape
+    set_pixels = np.argwhere(mask.T)
+    if len(set_pixels) == 0:
+        return []
+    y, x = set_pixels[0]
+    start = (int(x), int(y))
+
+    #8-neighborhood in clockwise order, starting to the east
+    directions = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
+    def is_set(px, py):
+        return 0 <= px < width and 0 <= py < height and mask[px, py]
+
+    outline = [start]
+    current = start
+    direction = 6
+    while True:
+        for turn in range(8):
+            d = (direction + 6 + turn) % 8 #Start looking backwards-left of the last move
+            nx, ny = current[0] + directions[d][0], current[1] + directions[d][1]
+            if is_set(nx, ny):
+                current = (nx, ny)
+                direction = d
+                break
+        else:
+            return outline #isolated pixel
+        outline.append(current)
+        if current == start:
+            return outline
@@ -0,0 +1,186 @@
+from BoardState import BoardState
+from Adjacency import Adjacency
+from TunableParameters import TunableParameters
+
+import numpy as np
+
+
+def _slice(ndim:int, axis:int, s:slice) -> tuple:
+    index = [slice(None)] * ndim
+    index[axis] = s
+    return tuple(index)
+
+def neighbor_sum(a:np.ndarray, vector:bool = False) -> np.ndarray:
+    '''
+    Sum of the 4-neighborhood (up, down, left, right) of every tile, tiles outside the board count as absent.
+    Works on (..., Y, X) scalar fields or (..., Y, X, 2) vector fields, any leading dimensions are kept.
+    '''
+    axis_y = a.ndim - (3 if vector else 2)
+    out = np.zeros_like(a)
+    for axis in (axis_y, axis_y + 1):
+        out[_slice(a.ndim, axis, slice(1, None))] += a[_slice(a.ndim, axis, slice(None, -1))]
+        out[_slice(a.ndim, axis, slice(None, -1))] += a[_slice(a.ndim, axis, slice(1, None))]
+    return out
+
+def neighbor_reduction(state:BoardState, adjacency:Adjacency = None) -> tuple:
+    '''
+    Neighbor sum function and number of neighbors of every tile, from shifted arrays or from a CSR index.
+    '''
+    if adjacency is None:
+        return neighbor_sum, neighbor_sum(np.ones(state.shape))
+    return adjacency.neighbor_sum, adjacency.degree.reshape(state.shape).astype(float)
+
+def normalize(v:np.ndarray) -> np.ndarray:
+    length = np.linalg.norm(v, axis=-1, keepdims=True)
+    return np.divide(v, length, out=np.zeros_like(v), where=length > 0)
+
+def neighbor_max(a:np.ndarray, fill:float = -np.inf) -> np.ndarray:
+    '''
+    Maximum of the 4-neighborhood of every tile of a (..., Y, X) scalar field, tiles outside the board count as fill.
+    '''
+    out = np.full_like(a, fill)
+    for axis in (a.ndim - 2, a.ndim - 1):
+        np.maximum(out[_slice(a.ndim, axis, slice(1, None))], a[_slice(a.ndim, axis, slice(None, -1))], out=out[_slice(a.ndim, axis, slice(1, None))])
+        np.maximum(out[_slice(a.ndim, axis, slice(None, -1))], a[_slice(a.ndim, axis, slice(1, None))], out=out[_slice(a.ndim, axis, slice(None, -1))])
+    return out
+
+def checkerboard(shape:tuple, rng = np.random) -> list[np.ndarray]:
+    '''
+    The two colors of the 4-neighborhood of a (..., Y, X) board, in random order.
+    '''
+    y, x = np.indices(shape[-2:])
+    black = np.broadcast_to((x + y) % 2 == 0, shape)
+    colors = [black, ~black]
+    if rng.random() < 0.5:
+        colors.reverse()
+    return colors
+
+def random_coloring(shape:tuple, rng = np.random) -> list[np.ndarray]:
+    '''
+    Coloring of the 4-neighborhood of a (..., Y, X) board from random priorities drawn at every call (Jones-Plassmann):
+    the uncolored tiles whose priority is above those of all their uncolored neighbors take the smallest color
+    not used by their neighbors, until every tile has a color. Returns one mask per color, at most 5.
+    '''
+    priority = rng.random(shape)
+    color = np.full(shape, -1)
+    while (color < 0).any():
+        remaining = np.where(color < 0, priority, -1.0)
+        selected = (color < 0) & (remaining > neighbor_max(remaining, -1.0))
+        c = 0
+        while selected.any():
+            used = neighbor_max((color == c).astype(float), 0.0) > 0
+            color[selected & ~used] = c
+            selected &= used
+            c += 1
+    return [color == c for c in range(color.max() + 1)]
+
+#Update orders of the kernels, 'all' updates every tile at once from the previous state
+COLORINGS = {
+    'checkerboard': checkerboard,
+    'random_coloring': random_coloring,
+}
+
+def run_kernel(kernel, state:BoardState, scheduler:str = 'all', mask:np.ndarray = None, adjacency:Adjacency = None,
+               parameters:TunableParameters = TunableParameters, rng = np.random) -> None:
+    '''
+    One step of a kernel. With a coloring the colors are updated one after the other, each one from the state
+    left by the previous colors, like the asynchronous tiles but with the tiles of a color updated together.
+    rng: np.random.Generator or RandomState of the simulation, the global NumPy generator by default.
+    '''
+    if scheduler == 'all':
+        kernel(state, mask, adjacency=adjacency, parameters=parameters, rng=rng)
+        return
+    for color in COLORINGS[scheduler](state.is_alive.shape, rng):
+        kernel(state, color if mask is None else color & mask, adjacency=adjacency, parameters=parameters, rng=rng)
+
+
+class Kernels:
+    '''
+    Whole-grid versions of the tile behaviors in Behaviors, operating on a BoardState.
+    All tiles are updated synchronously from the state of the previous step.
+    The optional mask restricts which tiles are written, and the optional adjacency (see Board.adjacency)
+    replaces the regular grid neighborhood. parameters are those of the simulation, rng its NumPy generator
+    (unused by the synchronous kernels, part of the interface for NumbaKernels).
+    '''
+    @staticmethod
+    def swarmy_rotation(state:BoardState, mask:np.ndarray = None, adjacency:Adjacency = None,
+                        parameters:TunableParameters = TunableParameters, rng = np.random) -> None:
+        TILE_SIZE = 1
+
+        active = state.is_alive & ~state.is_target
+        if mask is not None:
+            active &= mask
+
+        sum_neighbors, n_neighbors = neighbor_reduction(state, adjacency)
+        n_target_neighbors = sum_neighbors(state.is_target.astype(float))
+        membrane = active & (n_target_neighbors > 0)
+        diffusion = active & ~membrane
+
+        #CALCULATE EXCITATION SIGNAL
+        signal = state.signal_center_excitation_A * parameters.shrink_x
+        signal += np.where(state.is_contact, parameters.excitation_factor * (1.0 - parameters.shrink_x), 0.0)
+        state.signal_center_excitation_A[membrane] = signal[membrane]
+
+        #CALCULATE TRANSLATION
+        target_centers = sum_neighbors(state.center * state.is_target[..., None], vector=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_target_neighbors = target_centers / n_target_neighbors[..., None]
+            diffusion_translation = sum_neighbors(state.vector_translation, vector=True) / n_neighbors[..., None]
+        membrane_translation = avg_target_neighbors - state.center
+
+        #Rotation rule of the membrane: sign table on the translation vector
+        sx = np.sign(membrane_translation[..., 0])
+        sy = np.sign(membrane_translation[..., 1])
+        rotated = np.stack([np.where(sx == 0, sy, sx), np.where(sx == 0, sy, -sx)], axis=-1) * TILE_SIZE
+        excited = state.signal_center_excitation_A > parameters.threshold_x_a
+        membrane_translation = np.where(excited[..., None], rotated, membrane_translation)
+
+        translation = np.where(membrane[..., None], membrane_translation, diffusion_translation)
+        translation = normalize(translation)
+
+        state.vector_translation[active] = translation[active]
+        state.vector[active] = translation[active]
+
+    @staticmethod
+    def information_diffusion(state:BoardState, mask:np.ndarray = None, adjacency:Adjacency = None,
+                              parameters:TunableParameters = TunableParameters, rng = np.random) -> None:
+        active = state.is_alive.copy()
+        if mask is not None:
+            active &= mask
+
+        #Target tiles do not move the object
+        target = active & state.is_target
+        state.vector[target] = 0
+        state.vector_translation[target] = 0
+        state.vector_rotation[target] = 0
+        active &= ~state.is_target
+
+        #The knowledge of a tile covers all its neighbors, dead tiles share zero vectors
+        sum_neighbors, n_neighbors = neighbor_reduction(state, adjacency)
+        n_neighbors = n_neighbors[..., None]
+        n_target_neighbors = sum_neighbors(state.is_target.astype(float))[..., None]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            #point to the target
+            avg_target_position = sum_neighbors(state.center * state.is_target[..., None], vector=True) / n_target_neighbors
+            vector_to_object = avg_target_position - state.center
+
+            vector_translation = sum_neighbors(state.vector_translation, vector=True) / n_neighbors
+            translation = normalize(np.where(n_target_neighbors > 0, vector_to_object, vector_translation))
+
+            #Add information about the target to the knowledge
+            target_center = sum_neighbors(state.target_center, vector=True) / n_neighbors
+            target_angle = sum_neighbors(state.target_angle) / n_neighbors[..., 0]
+
+        contact = active & state.is_contact
+        r = state.center - state.object_center
+        perpendicular = normalize(np.stack([-r[..., 1], r[..., 0]], axis=-1))
+        error = target_angle - state.object_angle
+        error = np.where(error > 180, error - 360, error)
+        rotation = np.where(contact[..., None], 2*(-error[..., None])/180*perpendicular, 0.0)
+
+        state.vector_translation[active] = translation[active]
+        state.vector_rotation[active] = rotation[active]
+        state.vector[active] = translation[active] + rotation[active]
+        state.target_center[active] = target_center[active]
+        state.target_angle[active] = target_angle[active]
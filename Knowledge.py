@@ -0,0 +1,42 @@
+from collections.abc import Mapping
+from typing import Any
+import numpy as np
+
+
+class NeighborRecord(Mapping):
+    '''
+    Read-only view of the state of a neighbor, with the keys of the knowledge of the tiles.
+    Values are read from the neighbor when accessed (from the BoardState arrays for a TileView),
+    so a record is created once per neighbor and never rebuilt.
+    '''
+    KEYS = ('x', 'y',
+            'vector', 'vector_translation', 'vector_rotation',
+            'is_target', 'is_contact',
+            'object_center', 'object_angle',
+            'target_center', 'target_angle')
+    _keys = frozenset(KEYS)
+
+    __slots__ = ('tile',)
+
+    def __init__(self, tile) -> None:
+        self.tile = tile
+
+    def __getitem__(self, key:str) -> Any:
+        if key in self._keys:
+            return getattr(self.tile, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def snapshot(self) -> dict[str, Any]:
+        '''
+        Copy of the current values, arrays included, that later changes of the neighbor do not reach.
+        '''
+        return {key: np.array(value) if isinstance(value, np.ndarray) else value for key, value in self.items()}
+
+    def __repr__(self) -> str:
+        return f"NeighborRecord({self.tile})"
@@ -0,0 +1,186 @@
+import os
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+from Simulator import Simulator
+from Tetromino import Tetromino
+from SpatialHash import SpatialHash
+from Convergence import ConvergenceDetector
+from Tile import Tile
+import numpy as np
+
+
+class MultiObjectSimulator(Simulator):
+    '''
+    Several objects and targets on one board, all moved by the same field of tiles.
+    setup['symbols'] lists the objects, object k has to reach target k (same symbol). Each object has its own
+    contact set, resultant force and convergence detector, the simulation ends when all of them have converged.
+
+    The bounding boxes of the objects are kept in a SpatialHash, so the contacts of an object are only tested
+    against the objects near it and the cost of the contact detection follows the covered area.
+    Objects do not collide. A tile covered by several objects belongs to the one whose geometric center is
+    the nearest (the first one of setup['symbols'] on ties): it only gets the information of that object and only
+    pushes it, so the result does not depend on the order in which the objects are processed.
+
+    Extra setup keys:
+        symbols: list of symbols of the objects, [setup['symbol']] by default.
+        target_centers: list of the centers (pixels) of the targets, spread along the middle row by default.
+        cell_size: size in pixels of the cells of the spatial hash, the short side of an unrotated tetromino by default.
+    '''
+    def __init__(self, setup:dict, **kwargs):
+        '''
+        kwargs: behavior, parameters and generators of the simulation, see Simulator.
+        '''
+        if setup.get('engine') == 'distributed':
+            raise ValueError("A DistributedBoard reduces the forces of all the contact tiles at once, it cannot move several objects")
+        symbols = setup.get('symbols') or [setup['symbol']]
+        #The objects and the targets are placed here, the dead tiles are killed once the targets are set
+        super().__init__(dict(setup, symbol=symbols, object=False, target_shape=False, dead_tiles=0), **kwargs)
+        self.setup = dict(setup, symbols=symbols, object=True, target_shape=True)
+
+        size = self.board.X*self.board.TILE_SIZE
+        cell_size = self.setup.get('cell_size', 2*self.setup['resolution']*self.board.TILE_SIZE)
+        self.index = SpatialHash(cell_size)
+
+        self.objects: list[Tetromino] = []
+        for k, symbol in enumerate(symbols):
+            tetromino = Tetromino(symbol, self.setup['TILE_SIZE'], resolution=self.setup['resolution'], angle_quantum=self.setup.get('angle_quantum', 0), headless=self.headless)
+            tetromino.rect.center = (self.rng.randint(0, size), self.rng.randint(0, size))
+            tetromino.rotate(self.rng.randint(-180, 180), allow_max_rotation=False)
+            tetromino.rect.clamp_ip(self.border_rect)
+            self.index.insert(k, tetromino.rect)
+            self.objects.append(tetromino)
+
+        target_centers = self.setup.get('target_centers') or [(size*(k + 1)//(len(symbols) + 1), size//2 + 25) for k in range(len(symbols))]
+        if len(target_centers) != len(symbols):
+            raise ValueError("One target center per object is needed, setup['target_centers']")
+        self.targets: list[Tetromino] = []
+        for symbol, center in zip(symbols, target_centers):
+            target = Tetromino(symbol, self.setup['TILE_SIZE'], resolution=self.setup['resolution'], headless=self.headless)
+            target.set_angle(self.rng.randint(-180, 180))
+            target.rect.center = center
+            target.rect.clamp_ip(self.border_rect)
+            target.center = target.get_geometric_center()
+            self.set_target_shape_tiles(target)
+            self.targets.append(target)
+
+        #The single object API points to the first pair
+        self.tetromino, self.target = self.objects[0], self.targets[0]
+
+        self.contact_rects = [None]*len(self.objects)
+        self.object_contact_ids = [np.zeros(0, dtype=int) for _ in self.objects]
+        self.convergences = [ConvergenceDetector.from_spec(self.setup.get('convergence'), self.setup.get('convergence_mode', 'all')) for _ in self.objects]
+        self.converged = np.zeros(len(self.objects), dtype=bool)
+
+        if self.setup['save_data']:
+            self.dh.add_data(TARGET_CENTER = [target.center.tolist() for target in self.targets],
+                             TARGET_ANGLE = [target.angle%360 for target in self.targets],
+                             TARGET_TILES = self.board.get_targets(),
+                             TARGET_POLYGON = [list(target.shape.outline) for target in self.targets])
+        if self.setup['dead_tiles']: self.board.kill_tiles(self.setup['dead_tiles'])
+        self.board.vectors_to_none()
+
+    def get_and_set_contact_tiles(self) -> list[list[Tile]]:
+        '''
+        Contact tiles of each object. The tiles of the region an object can change (union of its previous
+        and current bounding boxes) are in contact if any of the objects found by the spatial hash covers them.
+        A tile covered by several objects is only a contact tile of its owner, see the class docstring.
+        '''
+        half = self.board.TILE_SIZE//2
+        contact_tiles = []
+        for k, tetromino in enumerate(self.objects):
+            rect = tetromino.rect
+            region = rect if self.contact_rects[k] is None else self.union_rect(rect, self.contact_rects[k])
+            self.contact_rects[k] = rect.copy()
+
+            xs, ys = self.board.get_tiles_in_rect(region)
+            px, py = xs*self.board.TILE_SIZE + half, ys*self.board.TILE_SIZE + half
+            own = tetromino.footprint(px, py)
+            covered = own.copy()
+            for j in self.index.query(region):
+                if j != k:
+                    covered |= self.objects[j].footprint(px, py)
+
+            self.board.set_contacts(xs, ys, covered)
+            ids = self.board.contact_ids
+            self.object_contact_ids[k] = ids[np.isin(ids, (ys*self.board.X + xs)[own])]
+            contact_tiles.append([self.board.tiles[i] for i in self.object_contact_ids[k]])
+
+        self.board.contact_ids = np.unique(np.concatenate(self.object_contact_ids))
+        self.contact_tiles = [self.board.tiles[i] for i in self.board.contact_ids]
+        if len(self.board.contact_ids) < sum(len(ids) for ids in self.object_contact_ids):
+            self.assign_shared_tiles()
+            contact_tiles = [[self.board.tiles[i] for i in ids] for ids in self.object_contact_ids]
+        return contact_tiles
+
+    def assign_shared_tiles(self) -> None:
+        '''
+        Keep the tiles covered by several objects only in the contact ids of the nearest object (first on ties).
+        '''
+        ids, counts = np.unique(np.concatenate(self.object_contact_ids), return_counts=True)
+        shared = ids[counts > 1]
+        half = self.board.TILE_SIZE//2
+        px = (shared % self.board.X)*self.board.TILE_SIZE + half
+        py = (shared // self.board.X)*self.board.TILE_SIZE + half
+        distances = np.full((len(shared), len(self.objects)), np.inf)
+        for k, (tetromino, object_ids) in enumerate(zip(self.objects, self.object_contact_ids)):
+            covers = np.isin(shared, object_ids)
+            distances[covers, k] = np.hypot(px[covers] - tetromino.center[0], py[covers] - tetromino.center[1])
+        owners = np.argmin(distances, axis=1)
+        for k, object_ids in enumerate(self.object_contact_ids):
+            lost = shared[owners != k]
+            self.object_contact_ids[k] = object_ids[~np.isin(object_ids, lost)]
+
+    def update_object(self) -> None:
+        '''
+        Move and rotate every object with the resultant of the vectors of its own contact tiles.
+        All the forces are read before any object moves.
+        '''
+        for k, tetromino in enumerate(self.objects):
+            tetromino.rect.clamp_ip(self.border_rect)
+            self.index.insert(k, tetromino.rect)
+        contact_tiles = self.get_and_set_contact_tiles()
+
+        forces = []
+        for tetromino, tiles, ids in zip(self.objects, contact_tiles, self.object_contact_ids):
+            self.fill_missing_information(tiles, tetromino)
+            forces.append(self.calculate_forces(ids, tetromino))
+        for tetromino, (resultant_vector, rotation) in zip(self.objects, forces):
+            tetromino.move(resultant_vector)
+            tetromino.rotate(rotation)
+
+    def end_condition(self) -> bool:
+        '''
+        Each object is tracked by its own convergence detector against its own target, and is not tracked
+        once converged (the tiles keep moving it). True when every object has converged.
+        '''
+        coverage = self.board.get_coverage() if 'coverage' in self.convergences[0].keys else None
+        for k, (tetromino, target, convergence) in enumerate(zip(self.objects, self.targets, self.convergences)):
+            if self.converged[k]:
+                continue
+            values = {
+                'position': np.linalg.norm(np.array(tetromino.rect.center) - np.array(target.rect.center)),
+                'angle': abs(tetromino.angle - target.angle),
+            }
+            if coverage is not None:
+                values['coverage'] = coverage
+            self.converged[k] = convergence.update(**values)
+        return bool(self.converged.all())
+
+    def record_data(self, save_sys_data = False) -> None:
+        #Same keys as Simulator.record_data, with one value per object
+        self.dh.add_data(object_center_x = [tetromino.center.tolist()[0] for tetromino in self.objects],
+                         object_center_y = [tetromino.center.tolist()[1] for tetromino in self.objects],
+                         object_angle = [tetromino.angle%360 for tetromino in self.objects],
+                         coverage = self.board.get_coverage())
+        if save_sys_data:
+            sys_data = self.board.get_system_data()
+            self.dh.add_data_list(**sys_data)
+            tetro_polygons = [[list(point) for point in tetromino.shape.outline] for tetromino in self.objects]
+            self.dh.add_data_list(TETROMINO_POLYGON = tetro_polygons)
+
+    def draw_objects(self, window) -> None:
+        for tetromino, target in zip(self.objects, self.targets):
+            if self.setup['show_tetromines']:
+                tetromino.draw(window)
+            if self.setup['show_tetromino_contour']:
+                tetromino.draw_contour(window)
+                target.draw_contour(window)
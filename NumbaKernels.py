@@ -0,0 +1,226 @@
+from BoardState import BoardState
+from Adjacency import Adjacency
+from TunableParameters import TunableParameters
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+#Numba is optional, without it setup['backend'] = 'numba' falls back to the NumPy kernels
+NUMBA = numba is not None
+
+def _njit(function):
+    if NUMBA:
+        return numba.njit(cache=True)(function)
+    return function
+
+
+@_njit
+def _shuffle(n, seed):
+    #Fisher-Yates on the random generator of the compiled code, seeded from NumPy so runs stay reproducible
+    np.random.seed(seed)
+    order = np.arange(n)
+    for i in range(n - 1, 0, -1):
+        j = np.random.randint(0, i + 1)
+        order[i], order[j] = order[j], order[i]
+    return order
+
+@_njit
+def _swarmy_rotation(order, offsets, neighbors, degree, active, is_target, is_contact, cx, cy,
+                     vector_translation, vector, signal, shrink, threshold, excitation):
+    TILE_SIZE = 1.0
+    for i in order:
+        if not active[i]:
+            continue
+
+        n_target = 0
+        tx = 0.0
+        ty = 0.0
+        for k in range(offsets[i], offsets[i + 1]):
+            j = neighbors[k]
+            if is_target[j]:
+                n_target += 1
+                tx += cx[j]
+                ty += cy[j]
+
+        if n_target > 0: #Membrane
+            s = signal[i] * shrink
+            if is_contact[i]:
+                s += excitation * (1.0 - shrink)
+            signal[i] = s
+
+            x = tx / n_target - cx[i]
+            y = ty / n_target - cy[i]
+            if s > threshold:
+                if x == 0:
+                    if y > 0:
+                        x, y = TILE_SIZE, TILE_SIZE
+                    elif y < 0:
+                        x, y = -TILE_SIZE, -TILE_SIZE
+                else:
+                    if x > 0:
+                        x, y = TILE_SIZE, -TILE_SIZE
+                    else:
+                        x, y = -TILE_SIZE, TILE_SIZE
+        else:
+            x = 0.0
+            y = 0.0
+            for k in range(offsets[i], offsets[i + 1]):
+                j = neighbors[k]
+                x += vector_translation[j, 0]
+                y += vector_translation[j, 1]
+            x /= degree[i]
+            y /= degree[i]
+
+        length = np.sqrt(x*x + y*y)
+        if length > 0:
+            x /= length
+            y /= length
+        vector_translation[i, 0] = x
+        vector_translation[i, 1] = y
+        vector[i, 0] = x
+        vector[i, 1] = y
+
+@_njit
+def _information_diffusion(order, offsets, neighbors, degree, active, is_target, is_contact, cx, cy,
+                           vector_translation, vector_rotation, vector, target_center, target_angle,
+                           object_center, object_angle):
+    for i in order:
+        if not active[i]:
+            continue
+
+        #Target tiles do not move the object
+        if is_target[i]:
+            for d in range(2):
+                vector[i, d] = 0.0
+                vector_translation[i, d] = 0.0
+                vector_rotation[i, d] = 0.0
+            continue
+
+        n_target = 0
+        tx = 0.0
+        ty = 0.0
+        x = 0.0
+        y = 0.0
+        center_x = 0.0
+        center_y = 0.0
+        angle = 0.0
+        for k in range(offsets[i], offsets[i + 1]):
+            j = neighbors[k]
+            if is_target[j]:
+                n_target += 1
+                tx += cx[j]
+                ty += cy[j]
+            x += vector_translation[j, 0]
+            y += vector_translation[j, 1]
+            center_x += target_center[j, 0]
+            center_y += target_center[j, 1]
+            angle += target_angle[j]
+
+        #Point to the target, or follow the neighbors
+        if n_target > 0:
+            x = tx / n_target - cx[i]
+            y = ty / n_target - cy[i]
+        else:
+            x /= degree[i]
+            y /= degree[i]
+        length = np.sqrt(x*x + y*y)
+        if length > 0:
+            x /= length
+            y /= length
+        vector_translation[i, 0] = x
+        vector_translation[i, 1] = y
+
+        target_center[i, 0] = center_x / degree[i]
+        target_center[i, 1] = center_y / degree[i]
+        target_angle[i] = angle / degree[i]
+
+        rx = 0.0
+        ry = 0.0
+        if is_contact[i]:
+            px = -(cy[i] - object_center[i, 1])
+            py = cx[i] - object_center[i, 0]
+            length = np.sqrt(px*px + py*py)
+            if length > 0:
+                px /= length
+                py /= length
+            error = target_angle[i] - object_angle[i]
+            if error > 180:
+                error -= 360
+            rx = 2*(-error)/180*px
+            ry = 2*(-error)/180*py
+        vector_rotation[i, 0] = rx
+        vector_rotation[i, 1] = ry
+        vector[i, 0] = x + rx
+        vector[i, 1] = y + ry
+
+
+@lru_cache(maxsize=None)
+def _grid(X:int, Y:int) -> Adjacency:
+    #Full 4-neighborhood, dead tiles hold zero vectors so they can be read like the per-tile behaviors do
+    return Adjacency.grid(X, Y)
+
+def _value(value, k:tuple) -> float:
+    #Parameters of a batch of environments are (K, 1, 1) arrays, see TunableParameters.stack
+    value = np.asarray(value, dtype=float)
+    return float(value[k].ravel()[0]) if value.ndim else float(value)
+
+def _environments(state:BoardState, mask:np.ndarray, adjacency:Adjacency, rng):
+    '''
+    Flat views of every environment of a (possibly batched) state, with its writable tiles and a random order.
+    '''
+    shape = state.is_alive.shape
+    batch = shape[:-2]
+    if adjacency is None:
+        adjacency = _grid(state.X, state.Y)
+    writable = np.broadcast_to(state.is_alive if mask is None else state.is_alive & mask, shape)
+    for k in np.ndindex(*batch):
+        active = np.ascontiguousarray(writable[k]).ravel()
+        if not active.any():
+            continue
+        fields = {name: getattr(state, name)[k] for name in state.fields}
+        seed = rng.integers(2**31) if isinstance(rng, np.random.Generator) else rng.randint(2**31)
+        order = _shuffle(active.size, seed)
+        yield k, order, adjacency, active, fields
+
+class NumbaKernels:
+    '''
+    Compiled versions of the tile behaviors in Behaviors, with the interface of Kernels.
+    The tiles are updated one at a time in a random order drawn at every step, each one reading
+    the current state of its neighbors, i.e. the asynchronous semantics of Board.act at compiled speed.
+    '''
+    @staticmethod
+    def compiled(kernel):
+        '''
+        Compiled counterpart of a kernel of Kernels, the kernel itself when Numba is not installed.
+        '''
+        if not NUMBA:
+            return kernel
+        return getattr(NumbaKernels, kernel.__name__)
+
+    @staticmethod
+    def swarmy_rotation(state:BoardState, mask:np.ndarray = None, adjacency:Adjacency = None,
+                        parameters:TunableParameters = TunableParameters, rng = np.random) -> None:
+        cx, cy = state.center[..., 0].ravel(), state.center[..., 1].ravel()
+        for k, order, adjacency, active, fields in _environments(state, mask, adjacency, rng):
+            _swarmy_rotation(order, adjacency.offsets, adjacency.neighbors, adjacency.degree.astype(float),
+                             active & ~fields['is_target'].ravel(), fields['is_target'].ravel(), fields['is_contact'].ravel(), cx, cy,
+                             fields['vector_translation'].reshape(-1, 2), fields['vector'].reshape(-1, 2),
+                             fields['signal_center_excitation_A'].reshape(-1),
+                             _value(parameters.shrink_x, k), _value(parameters.threshold_x_a, k), _value(parameters.excitation_factor, k))
+
+    @staticmethod
+    def information_diffusion(state:BoardState, mask:np.ndarray = None, adjacency:Adjacency = None,
+                              parameters:TunableParameters = TunableParameters, rng = np.random) -> None:
+        cx, cy = state.center[..., 0].ravel(), state.center[..., 1].ravel()
+        for k, order, adjacency, active, fields in _environments(state, mask, adjacency, rng):
+            _information_diffusion(order, adjacency.offsets, adjacency.neighbors, adjacency.degree.astype(float),
+                                   active, fields['is_target'].ravel(), fields['is_contact'].ravel(), cx, cy,
+                                   fields['vector_translation'].reshape(-1, 2), fields['vector_rotation'].reshape(-1, 2),
+                                   fields['vector'].reshape(-1, 2), fields['target_center'].reshape(-1, 2),
+                                   fields['target_angle'].reshape(-1), fields['object_center'].reshape(-1, 2),
+                                   fields['object_angle'].reshape(-1))
@@ -1,39 +1,157 @@
 import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 import random
-from Simulator import Simulator
-import random
 from Tile import Tile
 from Behaviors import Behaviors
 import json
 import sys
 import numpy as np
-from TunableParameters import TunableParameters
-from tqdm import tqdm
+from Runner import Runner
+from ResultCache import ResultCache
+from BatchedSimulator import BatchedSimulator
+from Kernels import Kernels
 
-def simulate(shrink,threshold):
-        TunableParameters.shrink_x = shrink
-        TunableParameters.threshold_x_a = threshold
-        
-        setup_0['symbol'] = random.choice(["I", "O", "T", "J", "L", "S", "Z"])
-        setup_0['resolution'] = 2
-        simulator = Simulator(setup_0)
-        results = simulator.run_simulation()
-        return results
-
-def loss_function(shrink,threshold):
-    random.seed(0)
-    np.random.seed(0)
-    losses = []
-    for i in tqdm(range(20)):
-        results = simulate(shrink,threshold)
-        coverage = results['coverage'][-1]
-        if coverage == 0:
-            coverage = 1e-5
-        loss = 1/coverage
-        losses.append(loss)
-    loss = np.mean(losses)
-    return loss
+SYMBOLS = ["I", "O", "T", "J", "L", "S", "Z"]
+
+def losses(points:list[tuple], runner:Runner, runs:int = 20, max_iterations:int = None) -> list[float]:
+    '''
+    Mean of 1/coverage of `runs` simulations for every (shrink, threshold) point, all of them sent to the runner at once.
+    Every point gets the same symbols and seeds (those of the first `runs` runs of the master seed), so the points
+    are compared on the same objects and targets. The cache of the runner only saves the runs of a point already made
+    with the same max_iterations, max_iterations is part of the setup and so of the key of a run.
+    max_iterations: cheaper evaluation with shorter simulations, setup_0['max_iterations'] by default.
+    '''
+    rng = random.Random(runner.master_seed)
+    symbols = [rng.choice(SYMBOLS) for _ in range(runs)]
+    seeds = runner.seeds(runs)
+    setup = dict(setup_0, resolution = 2, max_iterations = max_iterations or setup_0['max_iterations'])
+
+    setups = [dict(setup, symbol = symbol) for _ in points for symbol in symbols]
+    parameters = [{'shrink_x': float(shrink), 'threshold_x_a': float(threshold)} for shrink, threshold in points for _ in symbols]
+    results = runner.run(setups, parameters=parameters, seeds=seeds*len(points))
+    return mean_losses(results, len(points))
+
+def batched_losses(points:list[tuple], runner:Runner, runs:int = 20, max_iterations:int = None, kernel = Kernels.swarmy_rotation) -> list[float]:
+    '''
+    losses with the grid kernel: every point times every run is one environment of a BatchedSimulator, with the
+    parameters of the point as (K, 1, 1) arrays, so the whole evaluation is one batched board stepped by the kernel.
+    The runs have the symbols and seeds of losses, the runs of a seed start from the same board for every point.
+    Only the master seed of the runner is used, the batch runs in the current process and is not cached.
+    '''
+    rng = random.Random(runner.master_seed)
+    symbols = [rng.choice(SYMBOLS) for _ in range(runs)]
+    setup = dict(setup_0, resolution = 2, max_iterations = max_iterations or setup_0['max_iterations'], engine = 'arrays', kernel = kernel, headless = True)
+
+    setups = [dict(setup, symbol = symbol) for symbol in symbols]
+    parameters = [{'shrink_x': float(shrink), 'threshold_x_a': float(threshold)} for shrink, threshold in points]
+    results = BatchedSimulator.parameter_grid(setups, runner.seeds(runs), parameters).run_simulation()
+    return mean_losses(results, len(points))
+
+def mean_losses(results:list[dict], n_points:int) -> list[float]:
+    #Mean of 1/coverage of the runs of each point, the runs of a point are consecutive
+    coverages = np.array([run['coverage'][-1] for run in results], dtype=float).reshape(n_points, -1)
+    coverages[coverages == 0] = 1e-5
+    return (1/coverages).mean(axis=1).tolist()
+
+def loss_function(shrink, threshold, runner:Runner = None):
+    '''
+    Mean of 1/coverage of 20 runs with the parameters, seeded from the master seed of the runner.
+    With a ResultCache in the runner the points already evaluated are not simulated again.
+    '''
+    return losses([(shrink, threshold)], runner or Runner(master_seed=0))[0]
+
+def successive_halving(shrinks, thresholds, runner:Runner, eta:int = 3, min_runs:int = 2, max_runs:int = 20, min_iterations:int = 200, evaluate = losses) -> dict:
+    '''
+    Successive halving over the grid: every cell is evaluated with min_runs short simulations (min_iterations),
+    the best 1/eta of the cells are evaluated again with eta times more runs and longer simulations, and so on
+    until max_runs runs of setup_0['max_iterations'] iterations.
+    Returns the results of the grid search, SHRINKS, THRESHOLDS and LOSSES in the order of the grid. LOSSES only holds
+    the losses of the last rung (full evaluation), the cells eliminated before it are None. ESTIMATES holds the loss of
+    the last rung each cell reached, RUNS and ITERATIONS how it was evaluated, plus the best cell and the number of simulations.
+    evaluate: losses, or batched_losses to evaluate each rung as one batched board.
+    Each rung simulates a different number of iterations, so a rung never reuses the runs of the previous ones:
+    only a repeated search, or the refinement of the best cell (full runs), reads them from the cache.
+    '''
+    cells = [(shrink, threshold) for shrink in shrinks for threshold in thresholds]
+    rungs = 1 + max(0, int(np.ceil(np.log(max_runs/min_runs)/np.log(eta) - 1e-9)))
+    cell_losses = [None]*len(cells)
+    cell_runs = [0]*len(cells)
+    cell_iterations = [0]*len(cells)
+    simulations = 0
+
+    alive = list(range(len(cells)))
+    for rung in range(rungs):
+        runs = min(max_runs, min_runs*eta**rung)
+        fraction = rung/(rungs - 1) if rungs > 1 else 1
+        iterations = int(round(min_iterations*(setup_0['max_iterations']/min_iterations)**fraction))
+        values = evaluate([cells[i] for i in alive], runner, runs, iterations)
+        simulations += runs*len(alive)
+        for i, value in zip(alive, values):
+            cell_losses[i], cell_runs[i], cell_iterations[i] = value, runs, iterations
+        print(f"Rung {rung}: {len(alive)} cells, {runs} runs of {iterations} iterations, best loss {min(values)}")
+        if rung < rungs - 1:
+            alive = sorted(alive, key=lambda i: cell_losses[i])[:max(1, int(np.ceil(len(alive)/eta)))]
+
+    best = min(alive, key=lambda i: cell_losses[i])
+    return {
+        'SHRINKS': [float(shrink) for shrink, _ in cells],
+        'THRESHOLDS': [float(threshold) for _, threshold in cells],
+        'LOSSES': [loss if iterations == cell_iterations[best] and runs == cell_runs[best] else None
+                   for loss, runs, iterations in zip(cell_losses, cell_runs, cell_iterations)],
+        'ESTIMATES': cell_losses,
+        'RUNS': cell_runs,
+        'ITERATIONS': cell_iterations,
+        'BEST': [float(value) for value in cells[best]] + [cell_losses[best]],
+        'SIMULATIONS': simulations,
+    }
+
+def nelder_mead(function, x0, step, iterations:int = 30, bounds:tuple = None) -> tuple[np.array, float]:
+    '''
+    Minimum of function with the Nelder-Mead simplex method, starting from x0 with a simplex of size step.
+    The points are clipped to bounds, a (low, high) pair of arrays.
+    '''
+    clip = (lambda x: np.clip(x, *bounds)) if bounds is not None else (lambda x: x)
+    x0 = clip(np.asarray(x0, dtype=float))
+    simplex = [x0] + [clip(x0 + np.eye(len(x0))[d]*step[d]) for d in range(len(x0))]
+    values = [function(x) for x in simplex]
+
+    for _ in range(iterations):
+        order = np.argsort(values)
+        simplex, values = [simplex[i] for i in order], [values[i] for i in order]
+        centroid = np.mean(simplex[:-1], axis=0)
+
+        reflected = clip(centroid + (centroid - simplex[-1]))
+        reflected_value = function(reflected)
+        if reflected_value < values[0]:
+            expanded = clip(centroid + 2*(centroid - simplex[-1]))
+            expanded_value = function(expanded)
+            simplex[-1], values[-1] = (expanded, expanded_value) if expanded_value < reflected_value else (reflected, reflected_value)
+        elif reflected_value < values[-2]:
+            simplex[-1], values[-1] = reflected, reflected_value
+        else:
+            contracted = clip(centroid + 0.5*(simplex[-1] - centroid))
+            contracted_value = function(contracted)
+            if contracted_value < values[-1]:
+                simplex[-1], values[-1] = contracted, contracted_value
+            else:
+                #Shrink towards the best point
+                simplex = [simplex[0]] + [clip(simplex[0] + 0.5*(x - simplex[0])) for x in simplex[1:]]
+                values = [values[0]] + [function(x) for x in simplex[1:]]
+
+    best = int(np.argmin(values))
+    return simplex[best], values[best]
+
+def refine(point:tuple, runner:Runner, step:tuple, iterations:int = 20, runs:int = 20, evaluate = losses) -> dict:
+    '''
+    Continuous refinement of a point of the grid with nelder_mead on the full evaluation (same runs as the grid).
+    Every evaluation is `runs` full simulations, SIMULATIONS counts them (including those read from the cache).
+    '''
+    evaluations = []
+    def function(x):
+        evaluations.append(x)
+        return evaluate([tuple(x)], runner, runs)[0]
+    x, loss = nelder_mead(function, point, step, iterations, bounds=(np.array([0, 0]), np.array([1, np.inf])))
+    return {'SHRINK': float(x[0]), 'THRESHOLD': float(x[1]), 'LOSS': loss, 'SIMULATIONS': runs*len(evaluations)}
 
 def visualize_results(file_path):
     with open(file_path, 'r') as f:
@@ -41,7 +159,8 @@ def visualize_results(file_path):
     
     shrinks = results['SHRINKS']
     thresholds = results['THRESHOLDS']
-    losses = results['LOSSES']
+    #Cells without a full evaluation (None, eliminated by successive_halving) are left blank
+    losses = np.ma.masked_invalid(np.array(results['LOSSES'], dtype=float))
     
     import matplotlib.pyplot as plt
    
@@ -49,7 +168,7 @@ def visualize_results(file_path):
     ax = fig.add_subplot(111)
     X = len(np.unique(shrinks))
     Y = len(np.unique(thresholds))    
-    im = ax.imshow(np.array(losses).reshape((X,Y)), cmap='grey')
+    im = ax.imshow(losses.reshape((X,Y)), cmap='grey')
     #add axis titles
     ax.set_xticks(np.arange(X))
     ax.set_yticks(np.arange(Y))
@@ -117,26 +236,27 @@ if __name__ == "__main__":
     print(f"Shrinks: {shrinks}")
     print(f"Thresholds: {thresholds}")
 
-    results = {
-        'SHRINKS': [],
-        'THRESHOLDS': [],
-        'LOSSES': []
-    }
-    
-    counter = n**2
+    # Points of the grid already simulated, in this or a previous search, are read from the cache
+    runner = Runner(master_seed=0, cache=ResultCache(_folders.CACHE_PATH))
+
+    # losses runs the per-tile behavior of the published search over the processes of the runner (and its cache).
+    # evaluate = batched_losses runs all the cells of a rung as one batched board with the grid kernel
+    # (Kernels.swarmy_rotation), the synchronous counterpart of the behavior, so its losses are not the same
+    evaluate = losses
+
+    # Successive halving instead of the full grid of 20 runs per cell
+    results = successive_halving(shrinks, thresholds, runner, evaluate=evaluate)
+    print(f"Best: {results['BEST']}")
+
+    # Continuous refinement of the best cell, every step of nelder_mead costs 20 full simulations
+    refine_best = False
+    if refine_best:
+        step = (shrinks[1] - shrinks[0], thresholds[1] - thresholds[0])
+        results['REFINED'] = refine(results['BEST'][:2], runner, step, evaluate=evaluate)
+        results['SIMULATIONS'] += results['REFINED']['SIMULATIONS']
+        print(f"Refined: {results['REFINED']}")
+    print(f"Simulations: {results['SIMULATIONS']} instead of {20*n**2}")
 
-    for shrink in tqdm(shrinks):
-        for threshold in tqdm(thresholds):
-        
-            loss = loss_function(shrink,threshold)
-            
-            results['SHRINKS'].append(shrink)
-            results['THRESHOLDS'].append(threshold)
-            results['LOSSES'].append(loss)
-            
-            counter -= 1
-            print(f"To test: {counter}, Loss: {loss}, Params: {shrink,threshold}")
-    
     file_path = f'{_folders.RESULTS_PATH}/Optimization_Grid_Search_Fine_Tunning.json'
     with open(file_path, 'w') as f:
         json.dump(results, f)
@@ -0,0 +1,87 @@
+import functools
+import hashlib
+import json
+import os
+import pickle
+import numpy as np
+
+
+def _describe(value):
+    #JSON form of the values of a setup that json cannot write
+    if isinstance(value, functools.partial):
+        return {'function': value.func, 'args': list(value.args), 'keywords': value.keywords}
+    if callable(value):
+        name = getattr(value, '__qualname__', None)
+        if name is None or '<lambda>' in name or '<locals>' in name:
+            #All the lambdas of a module would get the same key
+            raise ValueError(f"{value!r} has no importable name and cannot be part of a cache key, use a module level function or no cache")
+        return f'{value.__module__}.{name}'
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return repr(value)
+
+
+class ResultCache:
+    '''
+    On-disk cache of the results of the runs, keyed by a hash of everything that determines a run:
+    the simulator class, the setup, the behavior, the TunableParameters values and the seed.
+    Each result is written to its own file as soon as the run ends, so an interrupted sweep resumes
+    where it stopped and changing a value only recomputes the runs that depend on it.
+
+    Functions (behaviors, kernels) are hashed by their qualified name, not by their code:
+    after changing the code of a behavior, clear the cache or increase VERSION. functools.partial objects are
+    hashed by their function and arguments. Lambdas, local functions and callable instances have no such name
+    and raise a ValueError, run them without a cache.
+    '''
+    VERSION = 1
+    #Setup keys that do not change the result of a run
+    IGNORED = ('file_name', 'delay', 'show_tetromines', 'show_tetromino_contour')
+
+    def __init__(self, path:str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def key(cls, simulator, setup:dict, seed:int, behavior, parameters:dict) -> str:
+        description = {
+            'version': cls.VERSION,
+            'simulator': simulator,
+            'setup': {name: value for name, value in setup.items() if name not in cls.IGNORED},
+            'seed': seed,
+            'behavior': behavior,
+            'parameters': parameters,
+        }
+        text = json.dumps(description, sort_keys=True, default=_describe)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def file(self, key:str) -> str:
+        return os.path.join(self.path, key[:2], f'{key}.pkl')
+
+    def __contains__(self, key:str) -> bool:
+        return os.path.exists(self.file(key))
+
+    def get(self, key:str, default=None):
+        try:
+            with open(self.file(key), 'rb') as file:
+                value = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def put(self, key:str, value) -> None:
+        #Written to a temporary file and renamed, a crash never leaves a partial result
+        path = self.file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump(value, file)
+        os.replace(temporary, path)
+
+    def __len__(self) -> int:
+        return sum(name.endswith('.pkl') for _, _, names in os.walk(self.path) for name in names)
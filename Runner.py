@@ -0,0 +1,166 @@
+import os
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from statistics import NormalDist
+from Simulator import Simulator
+from ResultCache import ResultCache
+from Tile import Tile
+from TunableParameters import TunableParameters
+import numpy as np
+import random
+import math
+
+
+def derive_seeds(master_seed:int, n:int) -> list[int]:
+    '''
+    One independent seed per run, the seed of run k only depends on master_seed and k.
+    '''
+    return [int(sequence.generate_state(1)[0]) for sequence in np.random.SeedSequence(master_seed).spawn(n)]
+
+def t_quantile(p:float, df:int) -> float:
+    '''
+    Quantile of the Student t distribution, exact for df = 1 (Cauchy) and a Cornish-Fisher expansion around
+    the normal quantile (Abramowitz and Stegun 26.7.5) above, within 1% of the exact value from df = 2 on.
+    '''
+    if df == 1:
+        return math.tan(math.pi*(p - 0.5))
+    z = NormalDist().inv_cdf(p)
+    return (z + (z**3 + z)/(4*df) + (5*z**5 + 16*z**3 + 3*z)/(96*df**2)
+              + (3*z**7 + 19*z**5 + 17*z**3 - 15*z)/(384*df**3)
+              + (79*z**9 + 776*z**7 + 1482*z**5 - 1920*z**3 - 945*z)/(92160*df**4))
+
+def half_width(values:list, confidence:float = 0.95) -> float:
+    '''
+    Half-width of the confidence interval of the mean of values, inf with less than two values.
+    '''
+    if len(values) < 2:
+        return math.inf
+    return t_quantile(0.5 + confidence/2, len(values) - 1)*float(np.std(values, ddof=1))/math.sqrt(len(values))
+
+def run_metrics(data:dict) -> dict:
+    '''
+    Final position error (pixels), angle error (degrees) and coverage of a run saved with save_data.
+    '''
+    position_error = np.hypot(data['object_center_x'][-1] - data['TARGET_CENTER'][0], data['object_center_y'][-1] - data['TARGET_CENTER'][1])
+    angle_error = abs(data['object_angle'][-1] - data['TARGET_ANGLE']) % 360
+    return {
+        'position_error': float(position_error),
+        'angle_error': float(min(angle_error, 360 - angle_error)),
+        'coverage': data['coverage'][-1],
+    }
+
+def run_job(job:tuple):
+    '''
+    Run one simulation with its own behavior, parameters and generators (see Simulator), the global state is not touched.
+    '''
+    simulator_class, setup, seed, behavior, parameters = job
+    return simulator_class(setup, behavior=behavior, parameters=parameters, rng=random.Random(seed), np_rng=np.random.RandomState(seed)).run_simulation()
+
+
+class Runner:
+    '''
+    Runs independent simulations over a ProcessPoolExecutor. Run k is seeded with derive_seeds(master_seed)[k]
+    and the results come back in the order of the setups, so they are the same whatever the number of workers.
+    With workers = 1 the runs are executed in the current process.
+    With a ResultCache the runs already in the cache are not executed and every new result is stored as soon as it ends.
+    '''
+    def __init__(self, workers:int = None, master_seed:int = 0, cache:ResultCache = None):
+        self.workers = workers or os.cpu_count()
+        self.master_seed = master_seed
+        self.cache = cache
+
+    def seeds(self, n:int) -> list[int]:
+        return derive_seeds(self.master_seed, n)
+
+    def cell_seed(self, *key:int) -> int:
+        '''
+        Seed of run key = (cell, run) of run_sequential, it only depends on master_seed and the key.
+        Longer keys give other independent streams, e.g. (cell, run, 1) to draw the symbol of the run.
+        '''
+        return int(np.random.SeedSequence(self.master_seed, spawn_key=key).generate_state(1)[0])
+
+    def run(self, setups:list[dict], behavior=None, simulator=Simulator, progress=None, parameters:list[dict] = None, seeds:list[int] = None) -> list:
+        '''
+        Results of simulator(setup).run_simulation() for every setup.
+        behavior: Tile.execute_behavior of the runs, the current one by default.
+        progress: wrapper of the iterator of the executed runs, e.g. tqdm.
+        parameters: per run TunableParameters values over the current ones, e.g. to evaluate several points of a search at once.
+        seeds: per run seeds instead of derive_seeds(master_seed), e.g. to give every point of a search the same runs.
+        '''
+        behavior = behavior or Tile.execute_behavior
+        values = TunableParameters.values()
+        parameters = [dict(values, **changes) for changes in parameters] if parameters is not None else [values]*len(setups)
+        seeds = seeds if seeds is not None else self.seeds(len(setups))
+        if len(parameters) != len(setups) or len(seeds) != len(setups):
+            raise ValueError("One set of parameters and one seed per setup are needed")
+        jobs = [(simulator, dict(setup), seed, behavior, run_parameters) for setup, seed, run_parameters in zip(setups, seeds, parameters)]
+
+        results = [None] * len(jobs)
+        keys = [None] * len(jobs)
+        pending = []
+        for i, job in enumerate(jobs):
+            if self.cache is not None:
+                keys[i] = self.cache.key(*job)
+                results[i] = self.cache.get(keys[i])
+                if results[i] is not None:
+                    continue
+            pending.append(i)
+
+        for i, result in self.execute(jobs, pending, progress):
+            results[i] = result
+            if self.cache is not None:
+                self.cache.put(keys[i], result)
+        return results
+
+    def run_sequential(self, cells:list, tolerances:dict, min_runs:int = 5, max_runs:int = 100, confidence:float = 0.95, metrics=run_metrics, behavior=None, simulator=Simulator, progress=None) -> list[list]:
+        '''
+        Runs of every cell until the confidence interval of the mean of each metric is narrower than its tolerance.
+        cells: one function per cell, cells[i](k) is the setup of run k of cell i. Run k of cell i is seeded with cell_seed(i, k).
+        tolerances: largest half-width of each metric, e.g. {'position_error': 5, 'angle_error': 5, 'coverage': 0.03}.
+        metrics: values of a run, run_metrics by default.
+        Returns the results of each cell, between min_runs and max_runs of them.
+
+        The cells are run in rounds: all the missing runs of a round go to the pool at once, so the workers stay busy
+        while some cells are still noisy. After each round a cell that is not precise enough asks for the number of runs
+        its current deviations need, at most twice the runs it has, so a noisy first estimate does not overshoot.
+        Every run is determined by its key, the results are the same whatever the number of workers and are cached.
+        '''
+        if not 2 <= min_runs <= max_runs:
+            raise ValueError("2 <= min_runs <= max_runs is needed to estimate a confidence interval")
+        results = [[] for _ in cells]
+        values = [[] for _ in cells]
+        planned = [min_runs]*len(cells)
+        while True:
+            keys = [(i, k) for i in range(len(cells)) for k in range(len(results[i]), planned[i])]
+            if not keys:
+                return results
+            data = self.run([cells[i](k) for i, k in keys], behavior, simulator, progress, seeds=[self.cell_seed(i, k) for i, k in keys])
+            for (i, k), run_data in zip(keys, data):
+                results[i].append(run_data)
+                values[i].append(metrics(run_data))
+
+            for i, cell_values in enumerate(values):
+                n = len(cell_values)
+                if n < planned[i] or n >= max_runs:
+                    continue
+                t = t_quantile(0.5 + confidence/2, n - 1)
+                needed = n
+                for name, tolerance in tolerances.items():
+                    deviation = float(np.std([run[name] for run in cell_values], ddof=1))
+                    needed = max(needed, math.ceil((t*deviation/tolerance)**2))
+                if needed > n:
+                    planned[i] = min(max_runs, 2*n, needed)
+
+    def execute(self, jobs:list[tuple], indices:list[int], progress=None):
+        '''
+        Yields (index, result) of the jobs at the given indices as they end.
+        '''
+        if self.workers == 1 or len(indices) <= 1:
+            done = ((i, run_job(jobs[i])) for i in indices)
+            yield from progress(done, total=len(indices)) if progress else done
+            return
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(indices))) as executor:
+            futures = {executor.submit(run_job, jobs[i]): i for i in indices}
+            done = ((futures[future], future.result()) for future in as_completed(futures))
+            yield from progress(done, total=len(indices)) if progress else done
@@ -2,27 +2,94 @@ import os
 import pandas as pd
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 from Board import Board
+from ArrayBoard import ArrayBoard
+from DistributedBoard import DistributedBoard
 from Tile import Tile
 from Tetromino import Tetromino
-import pygame
+from TunableParameters import TunableParameters
+from Geometry import Rect
 import sys
 import numpy as np
 import random
 import time
-from collections import deque
+import warnings
 import imageio
 from DataHandler import DH
+from Convergence import ConvergenceDetector
+from Kernels import COLORINGS
+from NumbaKernels import NumbaKernels, NUMBA
 
 class Simulator:
-    def __init__(self, setup:dict):
+    ENGINES = {
+        'objects': Board,
+        'arrays': ArrayBoard,
+        'distributed': DistributedBoard,
+    }
+
+    def __init__(self, setup:dict, behavior = None, parameters:TunableParameters = None, rng:random.Random = None, np_rng:np.random.Generator = None):
+        '''
+        behavior: behavior of the tiles (see Behaviors), Tile.execute_behavior when the simulator is created by default.
+        parameters: TunableParameters instance or dict of values, the class values of TunableParameters by default.
+        rng, np_rng: random.Random and np.random.Generator (or RandomState) of the simulation, the global random
+        module and NumPy generator by default. random.Random(seed) and np.random.RandomState(seed) give the same
+        runs as seeding the global generators with seed.
+        Simulations with their own behavior, parameters and generators can run side by side in one process.
+        '''
         self.pause = False
         self.setup = setup
-        self.board = Board(self.setup['N'], self.setup['TILE_SIZE'])        
+        self.rng = rng or random
+        self.np_rng = np_rng if np_rng is not None else np.random
+        if isinstance(parameters, dict):
+            parameters = TunableParameters(**parameters)
+        self.parameters = parameters or TunableParameters
+        self.behavior = behavior or Tile.execute_behavior
+        self.contact_tiles: list[Tile] = []
+        self.contact_rect = None
+
+        #Headless simulations use NumPy geometry (see Geometry.py) and never import pygame
+        self.headless = self.setup.get('headless', False)
+        if self.headless and self.setup['visualize']:
+            raise ValueError("A headless simulation cannot be visualized")
+
+        self.board = self.ENGINES[self.setup.get('engine', 'objects')](self.setup['N'], self.setup['TILE_SIZE'], headless=self.headless)
+        self.board.behavior = self.behavior
+        self.board.parameters = self.parameters
+        self.board.rng = self.rng
+        self.board.np_rng = self.np_rng
+        if isinstance(self.board, DistributedBoard):
+            self.board.n_workers = self.setup.get('workers', self.board.n_workers)
+        if self.setup.get('kernel'):
+            #Grid kernels (see Kernels.py) replace Tile.execute_behavior and need the array backend
+            if not isinstance(self.board, ArrayBoard):
+                raise ValueError("setup['kernel'] requires setup['engine'] = 'arrays'")
+            self.board.kernel = self.setup['kernel']
+            #'numba' runs the compiled sequential versions of the kernels, see NumbaKernels.py
+            if self.setup.get('backend', 'numpy') == 'numba':
+                if not NUMBA:
+                    warnings.warn("Numba is not installed, setup['backend'] = 'numba' falls back to the NumPy kernels")
+                self.board.kernel = NumbaKernels.compiled(self.board.kernel)
+            #'csr' gathers the neighbors through Board.adjacency, 'grid' uses shifted arrays
+            self.board.use_adjacency = self.setup.get('neighbor_index', 'grid') == 'csr'
+        elif self.setup.get('backend', 'numpy') == 'numba':
+            raise ValueError("setup['backend'] = 'numba' compiles a grid kernel, setup['kernel'] is needed")
+
+        #'active_set' only executes the tiles whose neighborhood changed, see Board.act_active_set.
+        #The colorings update the colors of the tiles one after the other with the kernel, see Kernels.run_kernel
+        self.board.scheduler = self.setup.get('scheduler', 'all')
+        self.board.active_tolerance = self.setup.get('active_tolerance', 1e-3)
+        if self.board.scheduler == 'active_set' and self.setup.get('kernel'):
+            raise ValueError("setup['scheduler'] = 'active_set' schedules the per-tile behaviors, it cannot be used with setup['kernel']")
+        if self.board.scheduler in COLORINGS and not self.setup.get('kernel'):
+            raise ValueError(f"setup['scheduler'] = '{self.board.scheduler}' needs a grid kernel, setup['kernel']")
+        if self.board.scheduler not in ('all', 'active_set', *COLORINGS):
+            raise ValueError(f"Unknown scheduler {self.board.scheduler}")
+
+        #Knowledge of the neighbors, see Tile.update_knowledge
+        if self.setup.get('knowledge', 'live') != 'live':
+            self.board.set_knowledge_mode(self.setup['knowledge'])
 
-        #End condition variables
-        self.memory_length = 100
-        self.error_position = deque(maxlen=self.memory_length)
-        self.error_angle = deque(maxlen=self.memory_length)
+        #End condition, see Convergence.py. The default is the rule of the paper
+        self.convergence = ConvergenceDetector.from_spec(self.setup.get('convergence'), self.setup.get('convergence_mode', 'all'))
 
         #Data variables
         if self.setup['save_data']:
@@ -36,26 +103,27 @@ class Simulator:
 
 
         if self.setup['visualize']: 
+            import pygame
             pygame.init()
             self.clock = pygame.time.Clock()
             pygame.font.init()
             pygame.display.set_caption('SimuV1')
 
         if self.setup['object']:
-            self.tetromino = Tetromino(self.setup['symbol'], self.setup['TILE_SIZE'], resolution=self.setup['resolution'])
+            self.tetromino = Tetromino(self.setup['symbol'], self.setup['TILE_SIZE'], resolution=self.setup['resolution'], angle_quantum=self.setup.get('angle_quantum', 0), headless=self.headless)
             #self.tetromino.rect.center = (self.board.X*self.board.TILE_SIZE//2, self.board.Y*self.board.TILE_SIZE//2)       
             #self.tetromino.rect.center = (0, 0)
-            self.tetromino.rect.center = (random.randint(0, self.setup['N']*self.board.TILE_SIZE),random.randint(0, self.setup['N']*self.board.TILE_SIZE))
-            self.tetromino.rotate(random.randint(-180, 180), allow_max_rotation=False)
+            self.tetromino.rect.center = (self.rng.randint(0, self.setup['N']*self.board.TILE_SIZE),self.rng.randint(0, self.setup['N']*self.board.TILE_SIZE))
+            self.tetromino.rotate(self.rng.randint(-180, 180), allow_max_rotation=False)
             
         for _ in range(self.setup['n_random_targets']):
-            self.board.get_tile(random.randint(0, self.board.X-1), random.randint(0, self.board.Y-1)).set_as_target()
+            self.board.get_tile(self.rng.randint(0, self.board.X-1), self.rng.randint(0, self.board.Y-1)).set_as_target()
 
         if self.setup['target_shape']:
-            self.target = Tetromino(self.setup['symbol'], self.setup['TILE_SIZE'], resolution=self.setup['resolution'])
+            self.target = Tetromino(self.setup['symbol'], self.setup['TILE_SIZE'], resolution=self.setup['resolution'], headless=self.headless)
             
             #Random target
-            self.target.set_angle(random.randint(-180, 180))
+            self.target.set_angle(self.rng.randint(-180, 180))
             self.target.rect.center = (self.board.X*self.board.TILE_SIZE//2, self.board.Y*self.board.TILE_SIZE//2 + 25)
             
             #Fixed target
@@ -67,100 +135,102 @@ class Simulator:
             if self.setup['save_data']:
                 self.dh.add_data(TARGET_CENTER = self.target.center.tolist(), 
                                  TARGET_ANGLE = self.target.angle%360,
-                                 TARGET_TILES = [tile.is_target for tile in self.board.tiles],
-                                 TARGET_POLYGON = self.target.mask.outline())
+                                 TARGET_TILES = self.board.get_targets(),
+                                 TARGET_POLYGON = list(self.target.shape.outline))
         #Setting the window
         if self.setup['visualize']:
             self.window = pygame.display.set_mode((self.board.X*self.board.TILE_SIZE, self.board.Y*self.board.TILE_SIZE))
 
-        self.border_rect = pygame.Rect(0, 0, self.board.X*self.board.TILE_SIZE, self.board.Y*self.board.TILE_SIZE)
+        if self.headless:
+            self.border_rect = Rect(0, 0, self.board.X*self.board.TILE_SIZE, self.board.Y*self.board.TILE_SIZE)
+        else:
+            import pygame
+            self.border_rect = pygame.Rect(0, 0, self.board.X*self.board.TILE_SIZE, self.board.Y*self.board.TILE_SIZE)
         if self.setup['object']: self.tetromino.rect.clamp_ip(self.border_rect)
         if self.setup['target_shape']: self.target.rect.clamp_ip(self.border_rect)
         if self.setup['dead_tiles']: self.board.kill_tiles(self.setup['dead_tiles'])
 
         self.board.vectors_to_none()
 
-    def set_target_shape_tiles(self) -> None:
+    def set_target_shape_tiles(self, target:Tetromino = None) -> None:
         '''
-        Set the tiles that are in contact with the target surface as target tiles.
+        Set the tiles that are in contact with the target surface (self.target by default) as target tiles.
         It also set the angle and the center of the target surface into the knowledge of the tiles.
         '''
-        for tile in self.board.tiles:
-            offset_x = - self.target.rect.x + tile.center_rect.left
-            offset_y = - self.target.rect.y + tile.center_rect.top
-            offset = (offset_x, offset_y)
-            offset = (offset_x, offset_y)
-
-            if self.target.mask.overlap(tile.center_mask, offset) != None:
-                tile.set_as_target()
-                tile.target_angle = self.target.angle
-                tile.target_center = self.target.rect.center
-             
+        target = target or self.target
+        for tile in self.get_covered_tiles(target):
+            tile.set_as_target()
+            tile.target_angle = target.angle
+            tile.target_center = target.rect.center
+
     def get_and_set_contact_tiles(self)->list[Tile]:
-        contact_tiles = []
-        for tile in self.board.tiles:
-            if not tile.is_alive: continue
-            offset_x = - self.tetromino.rect.x + tile.center_rect.left
-            offset_y = - self.tetromino.rect.y + tile.center_rect.top
-            offset = (offset_x, offset_y)
-            offset = (offset_x, offset_y)
-            if self.tetromino.mask.overlap(tile.center_mask, offset) != None:
-                tile.set_as_contact()
-                contact_tiles.append(tile)
-            else:
-                tile.set_as_no_contact()
-        return contact_tiles
-
-    def calculate_displacement(self, contact_tiles:list[Tile]) -> np.array:
-        resultant_vector = np.array([0, 0], dtype=float)
-        for tile in contact_tiles:
-            resultant_vector += tile.vector
-            
-        length = np.linalg.norm(resultant_vector)
-        if length != 0:
-            return resultant_vector / length
-        else:
-            return np.array([0, 0])
+        '''
+        Only the tiles inside the union of the previous and the current bounding boxes of the object can change.
+        '''
+        rect = self.tetromino.rect
+        region = rect if self.contact_rect is None else self.union_rect(rect, self.contact_rect)
+        self.contact_rect = rect.copy()
 
-    def calculate_rotation(self, contact_tiles:list[Tile]) -> float:
-        rotation = 0
-        tetromino_center = np.array(self.tetromino.rect.center)
+        xs, ys = self.board.get_tiles_in_rect(region)
+        half = self.board.TILE_SIZE//2
+        covered = self.tetromino.footprint(xs*self.board.TILE_SIZE + half, ys*self.board.TILE_SIZE + half)
+        self.contact_tiles = self.board.set_contacts(xs, ys, covered)
+        return self.contact_tiles
 
-        for tile in contact_tiles:
-            tile_center = np.array(tile.rect.center)
-            
-            vector_tetromino_tile = -tile_center + tetromino_center
-            length = np.linalg.norm(vector_tetromino_tile)
-            if length == 0:
-                continue
-            r = vector_tetromino_tile / length
-            f = tile.vector
-            rotation += np.cross(r, f)
-        return rotation  
+    @staticmethod
+    def union_rect(a, b) -> Rect:
+        '''
+        Bounding box of two rects.
+        '''
+        left, top = min(a.left, b.left), min(a.top, b.top)
+        right, bottom = max(a.right, b.right), max(a.bottom, b.bottom)
+        return Rect(left, top, right - left, bottom - top)
+
+    def get_covered_tiles(self, tetromino:Tetromino) -> list[Tile]:
+        '''
+        Tiles whose central pixel is covered by the tetromino, only the tiles inside its bounding box are tested.
+        '''
+        xs, ys = self.board.get_tiles_in_rect(tetromino.rect)
+        half = self.board.TILE_SIZE//2
+        covered = tetromino.footprint(xs*self.board.TILE_SIZE + half, ys*self.board.TILE_SIZE + half)
+        return [self.board.get_tile(x, y) for x, y in zip(xs[covered], ys[covered])]
+
+    def calculate_forces(self, ids:np.array, tetromino:Tetromino = None) -> tuple[np.array, float]:
+        '''
+        Resultant translation (normalized) and torque around the object center (self.tetromino by default) of the vectors of the tiles ids.
+        Both come from one reduction over the (fx, fy, torque) rows of the tiles, see Board.force_sums.
+        '''
+        if len(ids) == 0:
+            return np.array([0, 0]), 0
+        tetromino = tetromino or self.tetromino
+        resultant = self.board.force_sums(ids, np.array(tetromino.rect.center))
+        translation = resultant[:2]
+        length = np.linalg.norm(translation)
+        if length != 0:
+            translation = translation / length
+        return translation, resultant[2]
 
     def run_simulation(self, save_sys_data = False):
+        '''
+        Runs until the end condition or max_iterations. The board is closed at the end (a DistributedBoard
+        stops its workers and frees its shared memory), so a simulator runs once.
+        '''
+        try:
+            return self.simulation_loop(save_sys_data)
+        finally:
+            if hasattr(self.board, 'close'):
+                self.board.close()
+
+    def simulation_loop(self, save_sys_data = False):
+        if self.setup['visualize']: import pygame
+        self.board.count_coverage()
         self.begin_time = time.time()
         previous_time = time.time()
         if self.setup['save_animation']: self.frames = []
         iterations = 0
         while True:
             if not self.pause:
-                #self.board.get_coverage()
-                if self.setup['save_data']:
-                    #data_system = self.board.board_info()
-                    #data_system['object_center'] = self.tetromino.center.tolist()
-                    #data_system['object_angle'] = self.tetromino.angle
-                    self.dh.add_data(object_center_x = self.tetromino.center.tolist()[0],
-                                     object_center_y = self.tetromino.center.tolist()[1],
-                                     object_angle = self.tetromino.angle%360,
-                                     coverage = self.board.get_coverage())
-                    if save_sys_data:
-                        sys_data = self.board.get_system_data()
-                        self.dh.add_data_list(**sys_data)
-                        tetro_polygon = self.tetromino.mask.outline()
-                        tetro_polygon = [list(point) for point in tetro_polygon]
-                        self.dh.add_data_list(TETROMINO_POLYGON = tetro_polygon)
-
+                if self.setup['save_data']: self.record_data(save_sys_data)
 
             if self.setup['visualize']:
                 self.window.fill(0)
@@ -171,27 +241,12 @@ class Simulator:
                 
                 self.board.act()
 
-                if self.setup['object']: self.tetromino.rect.clamp_ip(self.border_rect)
-                if self.setup['object']: contact_tiles = self.get_and_set_contact_tiles()        
-
-                if self.setup['object']:# and time.time() - previous_time > 3: 
-                    self.fill_missing_information(contact_tiles)
-                    resultant_vector = self.calculate_displacement(contact_tiles)
-                    rotation = self.calculate_rotation(contact_tiles)
-           
-                    self.tetromino.move(resultant_vector)
-                    self.tetromino.rotate(rotation)
+                if self.setup['object']: self.update_object()
     
                 if self.setup['visualize']: self.board.draw(self.window)
                 if self.setup['delay']: time.sleep(0.5)
-                if self.setup['show_tetromines'] and self.setup['visualize'] and self.setup['object']:
-                    self.tetromino.draw(self.window)
-                
-                if self.setup['show_tetromino_contour'] and self.setup['visualize'] and self.setup['object']:
-                    self.tetromino.draw_contour(self.window)
-                    if self.setup['target_shape']:
-                        self.target.draw_contour(self.window)
-                
+                if self.setup['visualize'] and self.setup['object']:
+                    self.draw_objects(self.window)
                 
                 if self.setup['visualize']:
                     pygame.display.update()
@@ -208,40 +263,13 @@ class Simulator:
                 '''
                 # End condition
                 
-                if self.setup['object'] and True:
-                    err_pos = np.linalg.norm(np.array(self.tetromino.rect.center) - np.array(self.target.rect.center))
-                    err_ang = abs(self.tetromino.angle - self.target.angle)
-                    self.error_position.append(err_pos)
-                    self.error_angle.append(err_ang)
-
-                    if len(self.error_position) == self.memory_length:
-                        first_half_pos = [self.error_position[i] for i in range(self.memory_length//2)]
-                        second_half_pos = [self.error_position[i] for i in range(self.memory_length//2, self.memory_length)]
-                        avg_1_pos = sum(first_half_pos)/len(first_half_pos)
-                        avg_2_pos = sum(second_half_pos)/len(second_half_pos)
-                        if avg_1_pos == 0 and avg_2_pos == 0:
-                            diff_pos = 0
-                        else:
-                            diff_pos =  abs(avg_1_pos - avg_2_pos) / ((avg_1_pos + avg_2_pos) / 2) * 100
-
-                        first_half_ang = [self.error_angle[i] for i in range(self.memory_length//2)]
-                        second_half_ang = [self.error_angle[i] for i in range(self.memory_length//2, self.memory_length)]
-                        avg_1_ang = sum(first_half_ang)/len(first_half_ang)
-                        avg_2_ang = sum(second_half_ang)/len(second_half_ang)
-                        if avg_1_ang == 0 and avg_2_ang == 0:
-                            diff_ang = 0
-                        else:
-                            diff_ang =  abs(avg_1_ang - avg_2_ang) / ((avg_1_ang + avg_2_ang) / 2) * 100
-                        #print("diff_pos: ", diff_pos, "diff_ang: ", diff_ang)
-
-                        min_diff = 5
-                        if diff_pos < min_diff and diff_ang < min_diff:
-                            #print("Success! approximate")
-                            if self.setup['save_data']: return self.dh.data
-                            if self.setup['save_animation']:
-                                name = self.setup['save_animation']
-                                imageio.mimsave(f'{name}.gif', self.frames, duration=20)
-                            break
+                if self.setup['object'] and self.end_condition():
+                    #print("Success! approximate")
+                    if self.setup['save_data']: return self.dh.data
+                    if self.setup['save_animation']:
+                        name = self.setup['save_animation']
+                        imageio.mimsave(f'{name}.gif', self.frames, duration=20)
+                    break
                 
                 if self.setup['shuffle_targets']:
                     if time.time() - previous_time > 3:
@@ -252,29 +280,82 @@ class Simulator:
                 if iterations > self.setup['max_iterations']:
                     return self.dh.data
                     
-    def fill_missing_information(self, contact_tiles: list[Tile]) -> None: #Temporary hack
+    def draw_objects(self, window) -> None:
+        if self.setup['show_tetromines']:
+            self.tetromino.draw(window)
+        if self.setup['show_tetromino_contour']:
+            self.tetromino.draw_contour(window)
+            if self.setup['target_shape']:
+                self.target.draw_contour(window)
+
+    def record_data(self, save_sys_data = False) -> None:
+        #self.board.get_coverage()
+        #data_system = self.board.board_info()
+        #data_system['object_center'] = self.tetromino.center.tolist()
+        #data_system['object_angle'] = self.tetromino.angle
+        self.dh.add_data(object_center_x = self.tetromino.center.tolist()[0],
+                         object_center_y = self.tetromino.center.tolist()[1],
+                         object_angle = self.tetromino.angle%360,
+                         coverage = self.board.get_coverage())
+        if save_sys_data:
+            sys_data = self.board.get_system_data()
+            self.dh.add_data_list(**sys_data)
+            tetro_polygon = self.tetromino.shape.outline
+            tetro_polygon = [list(point) for point in tetro_polygon]
+            self.dh.add_data_list(TETROMINO_POLYGON = tetro_polygon)
+
+    def update_object(self) -> None:
+        '''
+        Move and rotate the object with the resultant of the vectors of the tiles in contact with it.
+        '''
+        self.tetromino.rect.clamp_ip(self.border_rect)
+        contact_tiles = self.get_and_set_contact_tiles()
+        self.fill_missing_information(contact_tiles)
+        resultant_vector, rotation = self.calculate_forces(self.board.contact_ids)
+
+        self.tetromino.move(resultant_vector)
+        self.tetromino.rotate(rotation)
+
+    def end_condition(self) -> bool:
+        '''
+        The simulation ends when the convergence detector is met, by default when the average position and angle
+        errors of the two halves of the last 100 steps differ by less than 5%.
+        '''
+        values = {
+            'position': np.linalg.norm(np.array(self.tetromino.rect.center) - np.array(self.target.rect.center)),
+            'angle': abs(self.tetromino.angle - self.target.angle),
+        }
+        if 'coverage' in self.convergence.keys:
+            values['coverage'] = self.board.get_coverage()
+        return self.convergence.update(**values)
+
+    def fill_missing_information(self, contact_tiles: list[Tile], tetromino:Tetromino = None) -> None: #Temporary hack
         '''
         This is an external source of information to cover the missing skill from the side of the tiles
         to identify the object that is in contact with them.
         Both target and tetromino angles and positions need to be known to the tiles.
         '''
+        tetromino = tetromino or self.tetromino
         for tile in contact_tiles:
-                center = self.tetromino.rect.center
+                center = tetromino.rect.center
                 center = (center[0]//self.board.TILE_SIZE, center[1]//self.board.TILE_SIZE)
-                tile.object_angle = self.tetromino.angle
+                tile.object_angle = tetromino.angle
                 tile.object_center = center
                 
     def shuffle_targets(self):
         for tile in self.board.tiles:
             if tile.is_target:
                 while True:
-                    new_tile = self.board.get_tile(random.randint(0, self.board.X-1), random.randint(0, self.board.Y-1))
+                    new_tile = self.board.get_tile(self.rng.randint(0, self.board.X-1), self.rng.randint(0, self.board.Y-1))
                     if not new_tile.is_target:
                         new_tile.set_as_target()
                         tile.set_as_no_target()
                         break
+        self.board.count_coverage()
+        self.board.wake()
               
     def handle_keyboard_input(self):
+        import pygame
         for event in pygame.event.get():
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
@@ -0,0 +1,59 @@
+from collections import defaultdict
+from typing import Hashable
+
+
+class SpatialHash:
+    '''
+    Uniform grid of square cells (in pixels) holding the keys of the rects that overlap each cell.
+    Querying a rect only visits the cells it covers, so finding the objects near a region costs
+    the area of the region and not the number of objects.
+    '''
+    def __init__(self, cell_size:int):
+        if cell_size <= 0:
+            raise ValueError("The cells of a spatial hash need a positive size")
+        self.cell_size = cell_size
+        self.cells: defaultdict[tuple, set] = defaultdict(set)
+        self.rects: dict[Hashable, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def cell_range(self, rect) -> tuple[range, range]:
+        '''
+        Columns and rows of the cells overlapped by a rect with left, top, right and bottom (right and bottom excluded).
+        '''
+        c = self.cell_size
+        return range(rect.left//c, (max(rect.right, rect.left + 1) - 1)//c + 1), range(rect.top//c, (max(rect.bottom, rect.top + 1) - 1)//c + 1)
+
+    def insert(self, key:Hashable, rect) -> None:
+        if key in self.rects:
+            self.remove(key)
+        columns, rows = self.cell_range(rect)
+        self.rects[key] = (columns, rows)
+        for j in rows:
+            for i in columns:
+                self.cells[i, j].add(key)
+
+    def remove(self, key:Hashable) -> None:
+        columns, rows = self.rects.pop(key)
+        for j in rows:
+            for i in columns:
+                cell = self.cells[i, j]
+                cell.discard(key)
+                if not cell:
+                    del self.cells[i, j]
+
+    def query(self, rect) -> set:
+        '''
+        Keys of the rects sharing a cell with rect, a superset of the rects that overlap it.
+        '''
+        keys = set()
+        columns, rows = self.cell_range(rect)
+        for j in rows:
+            for i in columns:
+                keys.update(self.cells.get((i, j), ()))
+        return keys
+
+    def clear(self) -> None:
+        self.cells.clear()
+        self.rects.clear()
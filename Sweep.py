@@ -0,0 +1,153 @@
+import os
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+import hashlib
+import importlib
+import itertools
+import json
+import random
+from ResultCache import ResultCache
+from Tile import Tile
+from TunableParameters import TunableParameters
+import numpy as np
+
+#Keys of a run that are not setup keys
+RUN_KEYS = ('simulator', 'behavior', 'parameters')
+#Setup keys holding functions, written by name in a specification
+FUNCTION_KEYS = ('kernel',)
+
+
+def name_of(function) -> str:
+    return f'{function.__module__}.{function.__qualname__}'
+
+def resolve(name:str):
+    '''
+    Object named 'module.attribute[.attribute]', e.g. 'Behaviors.Behaviors.information_diffusion'.
+    '''
+    parts = name.split('.')
+    for i in range(len(parts) - 1, 0, -1):
+        module = '.'.join(parts[:i])
+        try:
+            value = importlib.import_module(module)
+        except ModuleNotFoundError as error:
+            if error.name != module:
+                raise
+            continue
+        for part in parts[i:]:
+            value = getattr(value, part)
+        return value
+    raise ValueError(f"Cannot resolve {name}, names are module.attribute, e.g. Kernels.Kernels.swarmy_rotation")
+
+def digest(values:dict) -> int:
+    return int(hashlib.sha256(json.dumps(values, sort_keys=True).encode()).hexdigest()[:8], 16)
+
+
+class Sweep:
+    '''
+    Declarative experiment: a base setup, axes whose product gives the cells, and repeated runs of every cell.
+    A specification is a dict, or a .json/.toml file read by Sweep.load:
+
+        name:      name of the sweep in a WorkQueue, the file name by default.
+        simulator: class of the runs, 'Simulator.Simulator' by default.
+        setup:     base setup, functions (kernel) by name.
+        axes:      values of the keys of the cells, a setup key or behavior, parameters or simulator.
+                   'behavior+kernel+engine' takes lists of three values that change together.
+        sample:    values drawn per run, e.g. {'symbol': ['I', 'O', 'T']}, from a stream of the seed of the run.
+        repeats:   runs per cell, 1 by default.
+        seeds:     master_seed (0 by default) and policy:
+                   shared: run r has the same seed in every cell, derive_seeds(master_seed)[r] as in a Runner,
+                           so the cells are compared on the same objects and targets. The default.
+                   independent: the seed also depends on the values of the cell (not on its position),
+                                adding values to an axis keeps the seeds of the other cells.
+                   Or list: the seeds of the repeats.
+
+    Every run is a task with the key of ResultCache, runs with the same simulator, setup, behavior, parameters
+    and seed are listed once. A cached run is only reused for the very same run: the Exp_*_Data scripts draw their
+    symbols and seeds in sequence (random.Random(master_seed), derive_seeds over the whole list), so a sweep with the
+    same setups makes other runs than the script and does not reuse its results.
+    '''
+    def __init__(self, spec:dict):
+        self.spec = spec
+        self.name = spec.get('name', 'sweep')
+        self.simulator = spec.get('simulator', 'Simulator.Simulator')
+        self.setup = spec.get('setup', {})
+        self.axes = spec.get('axes', {})
+        self.sample = spec.get('sample', {})
+        seeds = spec.get('seeds', {})
+        self.master_seed = seeds.get('master_seed', 0)
+        self.policy = seeds.get('policy', 'shared')
+        self.seed_list = seeds.get('list')
+        self.repeats = len(self.seed_list) if self.seed_list is not None else spec.get('repeats', 1)
+
+        if self.policy not in ('shared', 'independent'):
+            raise ValueError(f"Unknown seed policy {self.policy}, use shared or independent")
+        for axis, values in self.axes.items():
+            if '+' in axis and any(len(value) != len(axis.split('+')) for value in values):
+                raise ValueError(f"Each value of the axis {axis} needs {len(axis.split('+'))} values")
+
+    @staticmethod
+    def load(path:str) -> 'Sweep':
+        if path.endswith('.toml'):
+            import tomllib
+            with open(path, 'rb') as file:
+                spec = tomllib.load(file)
+        else:
+            with open(path) as file:
+                spec = json.load(file)
+        return Sweep(dict({'name': os.path.splitext(os.path.basename(path))[0]}, **spec))
+
+    def cells(self) -> list[dict]:
+        '''
+        Values of every cell, product of the axes in their order (the last axis changes first).
+        '''
+        names = [axis.split('+') for axis in self.axes]
+        cells = []
+        for values in itertools.product(*self.axes.values()):
+            cell = {}
+            for axis_names, value in zip(names, values):
+                cell.update(zip(axis_names, value) if len(axis_names) > 1 else {axis_names[0]: value})
+            cells.append(cell)
+        return cells
+
+    def seed(self, cell:dict, repeat:int, stream:int = 0) -> int:
+        '''
+        Seed of run repeat of a cell, other streams give independent seeds for the draws of the sweep (sample).
+        '''
+        if self.seed_list is not None and stream == 0:
+            return self.seed_list[repeat]
+        key = (repeat,) if self.policy == 'shared' else (digest(cell), repeat)
+        key += (stream,) if stream else ()
+        return int(np.random.SeedSequence(self.master_seed, spawn_key=key).generate_state(1)[0])
+
+    def tasks(self) -> list[dict]:
+        '''
+        Runs of the sweep, by cell and then by repeat, as JSON dicts: simulator, setup, seed, behavior, parameters
+        (all the TunableParameters values), the cell and repeat they come from and their key.
+        '''
+        tasks = []
+        keys = set()
+        for cell in self.cells():
+            for repeat in range(self.repeats):
+                sampler = random.Random(self.seed(cell, repeat, 1))
+                run = dict(self.setup, **cell, **{name: sampler.choice(values) for name, values in self.sample.items()})
+                task = {
+                    'simulator': run.pop('simulator', self.simulator),
+                    'setup': {name: value for name, value in run.items() if name not in RUN_KEYS},
+                    'seed': self.seed(cell, repeat),
+                    'behavior': run.get('behavior') or name_of(Tile.execute_behavior),
+                    'parameters': TunableParameters.values(TunableParameters(**run.get('parameters', {}))),
+                    'cell': cell,
+                    'repeat': repeat,
+                }
+                task['key'] = ResultCache.key(*Sweep.job(task))
+                if task['key'] not in keys:
+                    keys.add(task['key'])
+                    tasks.append(task)
+        return tasks
+
+    @staticmethod
+    def job(task:dict) -> tuple:
+        '''
+        Job of Runner.run_job for a task, with the named classes and functions imported.
+        '''
+        setup = {name: resolve(value) if name in FUNCTION_KEYS and isinstance(value, str) else value for name, value in task['setup'].items()}
+        return resolve(task['simulator']), setup, task['seed'], resolve(task['behavior']), task['parameters']
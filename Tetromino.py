@@ -1,11 +1,88 @@
 import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
-import pygame
 import numpy as np
+import Geometry
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    import pygame
+
+
+class Shape:
+    '''
+    Surface of a tetromino with its mask and the values derived from it.
+    The surface is a pygame Surface, or its alpha channel as a NumPy array for the headless engine.
+    '''
+    def __init__(self, surface: 'pygame.Surface | np.ndarray'):
+        self.surface = surface
+        self._outline = None
+        if isinstance(surface, np.ndarray):
+            self.mask = None
+            self.mask_array = surface > 127
+            self.centroid = np.array(Geometry.mask_centroid(self.mask_array))
+            return
+
+        import pygame
+        self.mask = pygame.mask.from_surface(surface)
+        #Same pixels as the mask (alpha above 127), indexed as [x, y]
+        self.mask_array = pygame.surfarray.array_alpha(surface) > 127
+        self.centroid = np.array(self.mask.centroid())
+
+    @property
+    def outline(self) -> list:
+        if self._outline is None:
+            if self.mask is None:
+                self._outline = Geometry.mask_outline(self.mask_array)
+            else:
+                self._outline = self.mask.outline()
+        return self._outline
+
+
+class ShapeCache:
+    '''
+    Bounded LRU cache of shapes, shared by all the tetrominoes of the process.
+    '''
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.shapes: OrderedDict[tuple, Shape] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, build) -> Shape:
+        shape = self.shapes.get(key)
+        if shape is None:
+            self.misses += 1
+            shape = build()
+            self.shapes[key] = shape
+            if len(self.shapes) > self.max_size:
+                self.shapes.popitem(last=False)
+        else:
+            self.hits += 1
+            self.shapes.move_to_end(key)
+        return shape
+
+    def clear(self):
+        self.shapes.clear()
+        self.hits = 0
+        self.misses = 0
+
 
 class Tetromino:
-    def __init__(self, category: str, TILE_SIZE: int, resolution: int):
+    cache = ShapeCache()
+
+    def __init__(self, category: str, TILE_SIZE: int, resolution: int, angle_quantum: float = 0, headless: bool = False):
+        '''
+        angle_quantum: the object is rendered at its angle rounded to multiples of angle_quantum degrees,
+        so rotations reuse the cached shapes. With 0 the exact angle is rendered and not cached, exact angles
+        almost never repeat and would only fill the cache.
+        headless: surfaces, rects and masks are NumPy objects (see Geometry.py) and pygame is not imported.
+        '''
+        self.headless = headless
         self.TILE_SIZE = TILE_SIZE
+        self.category = category
+        self.resolution = resolution
+        self.angle_quantum = angle_quantum
+        self.base_angles = ()
         if category not in ["I", "O", "T", "J", "L", "S", "Z"]:
             raise ValueError(
                 "Invalid category, must be one of: I, O, T, J, L, S, Z")
@@ -18,9 +95,10 @@ class Tetromino:
                  "Z": (resolution*self.TILE_SIZE*2, resolution*self.TILE_SIZE*3), 
                  "T": (resolution*self.TILE_SIZE*2, resolution*self.TILE_SIZE*3)}
 
-        self.surface = pygame.transform.scale(pygame.image.load(f"Images/Tetrominos/{category}.png"), size=sizes[category])
-        self.rect = self.surface.get_rect()
-        self.mask = pygame.mask.from_surface(self.surface)
+        load = lambda: Shape(self.load_surface(f"Images/Tetrominos/{category}.png", sizes[category]))
+        self.set_shape(self.cache.get(self.shape_key(None), load))
+        self.surface = self.shape.surface
+        self.rect = self.get_rect(self.surface)
 
         self.angle = 0
         self.rect.x = -self.rect.width//2
@@ -34,12 +112,51 @@ class Tetromino:
 
     def set_angle(self, angle: int):
         self.angle = angle
-        self.surface = pygame.transform.rotate(self.surface, self.angle)
-        self.rect = self.surface.get_rect()
-        self.mask = pygame.mask.from_surface(self.surface)
+        self.base_angles = self.base_angles + (angle,)
+        surface = self.surface
+        self.set_shape(self.cache.get(self.shape_key(None), lambda: Shape(self.rotate_surface(surface, angle))))
+        self.surface = self.shape.surface
+        self.rect = self.get_rect(self.surface)
+
+    def shape_key(self, angle: float) -> tuple:
+        return (self.category, self.TILE_SIZE, self.resolution, self.headless, self.base_angles, angle)
+
+    def load_surface(self, path: str, size: tuple):
+        if self.headless:
+            return Geometry.scale(Geometry.load_alpha(path), size)
+        import pygame
+        return pygame.transform.scale(pygame.image.load(path), size=size)
+
+    def rotate_surface(self, surface, angle: float):
+        if self.headless:
+            return Geometry.rotate(surface, angle)
+        import pygame
+        return pygame.transform.rotate(surface, angle)
+
+    def get_rect(self, surface):
+        if self.headless:
+            return Geometry.get_rect(surface)
+        return surface.get_rect()
+
+    def set_shape(self, shape: Shape):
+        self.shape = shape
+        self.mask = shape.mask
+        self.mask_array = shape.mask_array
+
+    def footprint(self, px: np.array, py: np.array) -> np.array:
+        '''
+        Whether the object covers each of the given pixel coordinates of the window.
+        '''
+        ox = np.asarray(px) - self.rect.x
+        oy = np.asarray(py) - self.rect.y
+        width, height = self.mask_array.shape
+        inside = (ox >= 0) & (ox < width) & (oy >= 0) & (oy < height)
+        covered = np.zeros(inside.shape, dtype=bool)
+        covered[inside] = self.mask_array[ox[inside], oy[inside]]
+        return covered
 
     def get_geometric_center(self) -> np.array:
-        return np.array(self.mask.centroid()) + np.array(self.rect.topleft)
+        return self.shape.centroid + np.array(self.rect.topleft)
     
     def get_angle(self) -> int:
         return self.angle
@@ -59,18 +176,23 @@ class Tetromino:
         self.angle = (self.angle + angle)
         position = self.rect.center
 
-        self.surface_to_draw = pygame.transform.rotate(self.surface, self.angle)
-        self.rect = self.surface_to_draw.get_rect()
-        self.mask = pygame.mask.from_surface(self.surface_to_draw)
+        if self.angle_quantum:
+            angle = round(self.angle / self.angle_quantum) * self.angle_quantum
+            self.set_shape(self.cache.get(self.shape_key(angle), lambda: Shape(self.rotate_surface(self.surface, angle))))
+        else:
+            self.set_shape(Shape(self.rotate_surface(self.surface, self.angle)))
+        self.surface_to_draw = self.shape.surface
+        self.rect = self.get_rect(self.surface_to_draw)
         self.rect.center = position
         self.center = self.get_geometric_center()
 
-    def draw(self, window: pygame.Surface):
+    def draw(self, window: 'pygame.Surface'):
         window.blit(self.surface_to_draw, (self.rect.center[0] - int(self.surface_to_draw.get_width() / 2), self.rect.center[1] - int(self.surface_to_draw.get_height() / 2)))
         #pygame.draw.rect(window, (255, 0, 0), self.rect, 1)
     
-    def draw_contour(self, window: pygame.Surface):
-        for point in self.mask.outline():
+    def draw_contour(self, window: 'pygame.Surface'):
+        import pygame
+        for point in self.shape.outline:
             pygame.draw.circle(window, self.color, (self.rect.x + point[0], self.rect.y + point[1]), 1)
         pygame.draw.circle(window, self.color, self.center, self.TILE_SIZE//10)
         pygame.draw.line(window, self.color, self.center, (self.center[0] + self.TILE_SIZE * np.cos(np.radians(-self.angle)), self.center[1] + self.TILE_SIZE * np.sin(np.radians(-self.angle))), 1)
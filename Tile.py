@@ -1,27 +1,40 @@
-import os
-os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
-import pygame
 import numpy as np
-from typing import Any
+from Knowledge import NeighborRecord
+from typing import Any, TYPE_CHECKING
+if TYPE_CHECKING:
+    import pygame
+
+def _render_member(name:str) -> property:
+    def get(tile):
+        return tile.render[name]
+    def set(tile, value):
+        tile.render[name] = value
+    return property(get, set)
+
 
 class Tile:
+    '''
+    The rendering members (rect, masks, sensors) are only created when accessed, see create_render,
+    and the color is derived from the state of the tile.
+    '''
+    __slots__ = ('id', 'is_alive', 'tile_size', 'headless', '_render',
+                 'neighbors', 'vector', 'vector_translation', 'vector_rotation',
+                 'x', 'y', 'is_target', 'is_contact',
+                 'object_center', 'object_angle', 'target_center', 'target_angle',
+                 'knowledge', 'knowledge_mode', 'signal_center_excitation_A')
+
+    original_color = (50, 50, 50)
+    mask_color = (255, 0, 0)
+
     def __init__(self) -> None:
         
         self.id:int = None
         self.is_alive:bool = True
 
-        self.rect: pygame.Rect = None
-        self.mask: pygame.mask = None
-        self.original_color = (50, 50, 50)
-        self.color = self.original_color
-
-        self.center_rect: pygame.Rect = None
-        self.center_mask: pygame.mask = None
-        self.mask_color = (255, 0, 0)
-
-        self.sensors_centers = []
-        self.sensors_masks = []     
-
+        #Rendering, see create_render
+        self.tile_size: int = None
+        self.headless: bool = False
+        self._render: dict[str, Any] = None
 
         # Knowledge:
         self.neighbors:list[Tile] = []
@@ -41,10 +54,75 @@ class Tile:
         self.target_center = np.array([0, 0], dtype=float)             
         self.target_angle: float = 0                 
 
-        self.knowledge:dict[Tile, dict[str, Any]] = {}
+        self.knowledge:dict[Tile, NeighborRecord] = {}
+        self.knowledge_mode: str = 'live'
 
         # Signals:
         self.signal_center_excitation_A = 0
+
+    @property
+    def render(self) -> dict[str, Any]:
+        if self._render is None:
+            self._render = self.create_render()
+        return self._render
+
+    def create_render(self) -> dict[str, Any]:
+        '''
+        Rect, mask, central pixel and sensors of the tile, only needed to draw the board.
+        Headless tiles get NumPy rects (Geometry.Rect) and no masks or sensors.
+        '''
+        size = self.tile_size
+        left, top = self.x*size, self.y*size
+        if self.headless:
+            from Geometry import Rect
+            return {
+                'rect': Rect(left, top, size, size),
+                'mask': None,
+                'center_rect': Rect(left + size//2, top + size//2, 1, 1),
+                'center_mask': None,
+                'sensors_centers': [],
+                'sensors_masks': [],
+            }
+
+        import pygame
+        render = {
+            'rect': pygame.Rect(left, top, size, size),
+            'mask': pygame.mask.from_surface(pygame.Surface((size, size))),
+            #Central pixel of the tile
+            'center_rect': pygame.Rect(left + size//2, top + size//2, 1, 1),
+            'center_mask': pygame.mask.from_surface(pygame.Surface((1, 1))),
+            'sensors_centers': [],
+            'sensors_masks': [],
+        }
+
+        #Sensors
+        n_sensor = 1
+        padding = size//6
+        x_sensor = np.linspace(padding, size-padding, n_sensor, dtype=int)
+        y_sensor = np.linspace(padding, size-padding, n_sensor, dtype=int)
+        for xs in x_sensor:
+            for ys in y_sensor:
+                render['sensors_centers'].append(pygame.Rect(left + xs, top + ys, 1, 1))
+                render['sensors_masks'].append(pygame.mask.from_surface(pygame.Surface((1, 1))))
+        return render
+
+    rect = _render_member('rect')
+    mask = _render_member('mask')
+    center_rect = _render_member('center_rect')
+    center_mask = _render_member('center_mask')
+    sensors_centers = _render_member('sensors_centers')
+    sensors_masks = _render_member('sensors_masks')
+
+    @property
+    def color(self):
+        #Derived from the state, the flags can be changed directly. A target in contact is drawn as a target
+        if not self.is_alive:
+            return (0, 0, 0)
+        if self.is_target:
+            return (255,0,0)
+        if self.is_contact:
+            return (255,160,122)
+        return self.original_color
         
     @property
     def target_neighbors(self):
@@ -84,33 +162,33 @@ class Tile:
         }
     
     def update_knowledge(self):
+        '''
+        'live' knowledge holds one NeighborRecord per neighbor, created once, that reads the neighbor when accessed.
+        'snapshot' knowledge copies the state of the neighbors at every call, for behaviors that must see
+        delayed information (e.g. Board.update_knowledge followed by Board.execute_behavior).
+        '''
         if not self.is_alive:
             return
-        for neighbor in self.neighbors:
-            self.knowledge[neighbor] = {}
-            self.knowledge[neighbor]['x'] = neighbor.x  #this is not going to change
-            self.knowledge[neighbor]['y'] = neighbor.y  #this is not going to change
-
-            self.knowledge[neighbor]['vector'] = neighbor.vector
-            self.knowledge[neighbor]['vector_translation'] = neighbor.vector_translation
-            self.knowledge[neighbor]['vector_rotation'] = neighbor.vector_rotation
-
-            self.knowledge[neighbor]['is_target'] = neighbor.is_target
-            self.knowledge[neighbor]['is_contact'] = neighbor.is_contact
-
-            self.knowledge[neighbor]['object_center'] = neighbor.object_center
-            self.knowledge[neighbor]['object_angle'] = neighbor.object_angle 
-
-            self.knowledge[neighbor]['target_center'] = neighbor.target_center
-            self.knowledge[neighbor]['target_angle'] = neighbor.target_angle
-
-
-    def execute_behavior(self):
+        if self.knowledge_mode == 'snapshot':
+            for neighbor in self.neighbors:
+                self.knowledge[neighbor] = NeighborRecord(neighbor).snapshot()
+            return
+        if len(self.knowledge) != len(self.neighbors):
+            for neighbor in self.neighbors:
+                if neighbor not in self.knowledge:
+                    self.knowledge[neighbor] = NeighborRecord(neighbor)
+
+    def set_knowledge_mode(self, mode:str):
+        if mode not in ('live', 'snapshot'):
+            raise ValueError(f"Unknown knowledge mode {mode}, use 'live' or 'snapshot'")
+        self.knowledge_mode = mode
+        self.knowledge.clear()
+
+    def execute_behavior(self, parameters = None):
         raise NotImplementedError
 
     def die(self):
         self.is_alive = False
-        self.color = (0,0,0)
         self.vector = np.array([0, 0], dtype=float)
         self.vector_translation = np.array([0, 0], dtype=float)
         self.vector_rotation = np.array([0, 0], dtype=float)
@@ -123,19 +201,15 @@ class Tile:
 
     def set_as_target(self):
         self.is_target = True
-        self.color = (255,0,0)
 
     def set_as_no_target(self):
         self.is_target = False
-        self.color = self.original_color
 
     def set_as_contact(self):
         self.is_contact = True
-        self.color = (255,160,122)
     
     def set_as_no_contact(self):
         self.is_contact = False
-        self.color = self.original_color
 
     def get_coordinates(self):
         return (self.x, self.y)
@@ -1,10 +1,51 @@
+import numpy as np
+
+
 class TunableParameters:
     shrink_x = 0.5       # Optimal Value
     threshold_x_a = 0.16 # Optimal Value
 
     excitation_factor = 1  # fixed for now
 
+    def __init__(self, **values):
+        '''
+        Parameters of one simulation, see Simulator. The values not given are the class values,
+        which are also the parameters of the simulations that do not have their own.
+        '''
+        defaults = TunableParameters.values()
+        for name, value in values.items():
+            if name not in defaults:
+                raise ValueError(f"Unknown parameter {name}, use one of {list(defaults)}")
+        for name, value in dict(defaults, **values).items():
+            setattr(self, name, value)
+
+    def __repr__(self) -> str:
+        return f"TunableParameters({', '.join(f'{name}={value}' for name, value in TunableParameters.values(self).items())})"
+
     @staticmethod
     def printValues():
         print("Parameters:",TunableParameters.shrink_x,TunableParameters.threshold_x_a)#,TunableParameters.shrink_x_b,TunableParameters.threshold_x_b)
 
+    @staticmethod
+    def values(parameters = None) -> dict:
+        '''
+        Values of a TunableParameters instance, of the class values by default, e.g. to hand them to other processes.
+        '''
+        names = [name for name, value in vars(TunableParameters).items() if not name.startswith('_') and not callable(value) and not isinstance(value, staticmethod)]
+        source = TunableParameters if parameters is None else parameters
+        return {name: getattr(source, name) for name in names}
+
+    @staticmethod
+    def stack(parameters:list) -> 'TunableParameters':
+        '''
+        Parameters of a batch of K environments: each value is a (K, 1, 1) array that broadcasts against
+        the (K, Y, X) fields of a batched BoardState, so a kernel step runs every environment with its own values.
+        parameters: TunableParameters instances or dicts of values, one per environment.
+        '''
+        values = [TunableParameters.values(p if not isinstance(p, dict) else TunableParameters(**p)) for p in parameters]
+        return TunableParameters(**{name: np.array([v[name] for v in values], dtype=float).reshape(-1, 1, 1) for name in values[0]})
+
+    @staticmethod
+    def set_values(values:dict):
+        for name, value in values.items():
+            setattr(TunableParameters, name, value)
@@ -0,0 +1,206 @@
+import os
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+from contextlib import contextmanager
+from multiprocessing import Process
+from ResultCache import ResultCache
+from Runner import run_job
+from Sweep import Sweep
+import json
+import socket
+import sqlite3
+import time
+import traceback
+
+
+class WorkQueue:
+    '''
+    Durable queue of the runs of sweeps (see Sweep.py) in a SQLite database. Any number of worker processes,
+    on this host or on others sharing the filesystem, claim runs one at a time and store the results in a ResultCache.
+
+    A claimed run is leased: if its worker dies, the run is claimed again once the lease expires, a run is failed
+    after max_attempts. Every write is a short IMMEDIATE transaction on a new connection and the database
+    keeps the default rollback journal, the WAL journal does not work over network filesystems.
+
+        python WorkQueue.py queue.db submit Sweeps/Faulty.json
+        python WorkQueue.py queue.db work --workers 8     (on every host)
+        python WorkQueue.py queue.db status
+    '''
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS tasks (
+            key TEXT PRIMARY KEY,
+            task TEXT NOT NULL,
+            status TEXT NOT NULL,
+            worker TEXT,
+            claimed REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status);
+        CREATE TABLE IF NOT EXISTS sweeps (
+            sweep TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            task TEXT NOT NULL,
+            PRIMARY KEY (sweep, position)
+        );
+    '''
+    STATUSES = ('pending', 'running', 'done', 'failed')
+
+    def __init__(self, path:str, cache:ResultCache = None, lease:float = 3600, max_attempts:int = 3):
+        '''
+        cache: where the results are stored, {database name}_cache next to the database by default.
+        lease: seconds before the run of a silent worker is given to another one, longer than the longest run.
+        '''
+        self.path = path
+        self.cache = cache if cache is not None else ResultCache(f'{os.path.splitext(path)[0]}_cache')
+        self.lease = lease
+        self.max_attempts = max_attempts
+        db = sqlite3.connect(self.path, timeout=600)
+        try:
+            db.executescript(self.SCHEMA)
+        finally:
+            db.close()
+
+    @contextmanager
+    def transaction(self, write:bool = True):
+        #Writers take the lock when they begin, so two workers never claim the same run
+        db = sqlite3.connect(self.path, timeout=600, isolation_level=None)
+        try:
+            db.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+            yield db
+            db.execute('COMMIT')
+        except BaseException:
+            if db.in_transaction:
+                db.execute('ROLLBACK')
+            raise
+        finally:
+            db.close()
+
+    def submit(self, sweep:Sweep) -> int:
+        '''
+        Queue the runs of a sweep, returns the number of new runs. The runs already queued (by any sweep)
+        or already in the cache are not queued again. Submitting a sweep again replaces its list of runs.
+        '''
+        tasks = sweep.tasks()
+        new = 0
+        with self.transaction() as db:
+            db.execute('DELETE FROM sweeps WHERE sweep = ?', (sweep.name,))
+            for position, task in enumerate(tasks):
+                text = json.dumps(task)
+                status = 'done' if task['key'] in self.cache else 'pending'
+                new += db.execute('INSERT OR IGNORE INTO tasks (key, task, status) VALUES (?, ?, ?)', (task['key'], text, status)).rowcount
+                db.execute('INSERT INTO sweeps (sweep, position, key, task) VALUES (?, ?, ?, ?)', (sweep.name, position, task['key'], text))
+        return new
+
+    def claim(self, worker:str) -> dict:
+        '''
+        Task of a pending run or of a run whose lease expired, None if there is none.
+        '''
+        expired = time.time() - self.lease
+        with self.transaction() as db:
+            db.execute("UPDATE tasks SET status = 'failed', error = 'Lease expired' WHERE status = 'running' AND claimed < ? AND attempts >= ?",
+                       (expired, self.max_attempts))
+            row = db.execute("SELECT key, task FROM tasks WHERE status = 'pending' OR (status = 'running' AND claimed < ?) ORDER BY rowid LIMIT 1",
+                             (expired,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE tasks SET status = 'running', worker = ?, claimed = ?, attempts = attempts + 1 WHERE key = ?",
+                       (worker, time.time(), row[0]))
+        return json.loads(row[1])
+
+    def complete(self, key:str, result) -> None:
+        #The result is stored before the run is marked done, a crash in between only repeats the run
+        self.cache.put(key, result)
+        with self.transaction() as db:
+            db.execute("UPDATE tasks SET status = 'done', error = NULL WHERE key = ?", (key,))
+
+    def fail(self, key:str, error:str) -> None:
+        with self.transaction() as db:
+            db.execute("UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ? WHERE key = ?",
+                       (self.max_attempts, error, key))
+
+    def retry(self) -> int:
+        '''
+        Queue the failed runs again, returns their number.
+        '''
+        with self.transaction() as db:
+            return db.execute("UPDATE tasks SET status = 'pending', attempts = 0 WHERE status = 'failed'").rowcount
+
+    def work(self, worker:str = None, wait:bool = False, poll:float = 10) -> int:
+        '''
+        Run the queued runs until there is none to claim, returns the number of runs made.
+        wait: keep polling while other workers have runs, to take over the runs that fail or expire.
+        '''
+        worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+        done = 0
+        while True:
+            task = self.claim(worker)
+            if task is None:
+                if not wait or self.status()['running'] == 0:
+                    return done
+                time.sleep(poll)
+                continue
+            try:
+                result = run_job(Sweep.job(task))
+            except Exception:
+                self.fail(task['key'], traceback.format_exc())
+                continue
+            self.complete(task['key'], result)
+            done += 1
+
+    def status(self, sweep:str = None) -> dict:
+        '''
+        Number of runs of each status, of a sweep or of the whole queue.
+        '''
+        with self.transaction(write=False) as db:
+            if sweep is None:
+                rows = db.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall()
+            else:
+                rows = db.execute('SELECT status, COUNT(*) FROM sweeps JOIN tasks USING (key) WHERE sweep = ? GROUP BY status', (sweep,)).fetchall()
+        return dict({status: 0 for status in self.STATUSES}, **dict(rows))
+
+    def results(self, sweep:str) -> list[tuple[dict, object]]:
+        '''
+        (task, result) of every run of a sweep in the order of Sweep.tasks, the result is None if the run is not done.
+        '''
+        with self.transaction(write=False) as db:
+            rows = db.execute('SELECT sweeps.task, tasks.status FROM sweeps JOIN tasks USING (key) WHERE sweep = ? ORDER BY position', (sweep,)).fetchall()
+        results = []
+        for text, status in rows:
+            task = json.loads(text)
+            results.append((task, self.cache.get(task['key']) if status == 'done' else None))
+        return results
+
+
+def work(path:str, cache_path:str, lease:float, wait:bool) -> int:
+    #Entry point of a worker process, every process opens its own connections
+    return WorkQueue(path, ResultCache(cache_path), lease).work(wait=wait)
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Sweeps over a SQLite work queue, see WorkQueue.py and Sweep.py')
+    parser.add_argument('database')
+    parser.add_argument('command', choices=['submit', 'work', 'status', 'retry'])
+    parser.add_argument('specs', nargs='*', help='sweep specifications (.json or .toml) to submit')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes of this host')
+    parser.add_argument('--cache', default=None, help='folder of the results, shared by all the hosts')
+    parser.add_argument('--lease', type=float, default=3600)
+    parser.add_argument('--wait', action='store_true', help='keep the workers until every run is done')
+    arguments = parser.parse_args()
+
+    queue = WorkQueue(arguments.database, ResultCache(arguments.cache) if arguments.cache else None, arguments.lease)
+    if arguments.command == 'submit':
+        for spec in arguments.specs:
+            sweep = Sweep.load(spec)
+            print(f'{sweep.name}: {queue.submit(sweep)} new runs, {queue.status(sweep.name)}')
+    elif arguments.command == 'work':
+        processes = [Process(target=work, args=(arguments.database, queue.cache.path, arguments.lease, arguments.wait)) for _ in range(arguments.workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        print(queue.status())
+    elif arguments.command == 'retry':
+        print(f'{queue.retry()} runs queued again')
+    else:
+        print(queue.status())
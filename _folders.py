@@ -12,6 +12,7 @@ DEFAULT_FOLDERS = {
     'SIMULATIONS': '__Simulations',
     'VISUALIZATIONS': '__Visualizations',
     'RESULTS': '__Results',
+    'CACHE': '__Cache',
 }
 
 # FOLDER PATHS
@@ -19,6 +20,7 @@ MODELS_PATH =           None
 SIMULATIONS_PATH =      None
 VISUALIZATIONS_PATH =   None
 RESULTS_PATH =          None
+CACHE_PATH =            None
 
 def _folder_paths() -> dict:
     paths = {}
@@ -54,6 +56,7 @@ def set_experiment_folders(experiment_name:str):
         'SIMULATIONS': f'{experiment_name}/{SIMULATIONS_PATH}',
         'VISUALIZATIONS': f'{experiment_name}/{VISUALIZATIONS_PATH}',
         'RESULTS': f'{experiment_name}/{RESULTS_PATH}',
+        'CACHE': f'{experiment_name}/{CACHE_PATH}',
     })
     _create_folders()
 